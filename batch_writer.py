@@ -0,0 +1,129 @@
+import json
+import os
+import time
+
+from id_store import GOOD
+
+
+class LedgerWriter:
+    """
+    Group-commits scraped records and ID status updates together.
+
+    Each commit first appends the whole batch as one line to a journal
+    (write-ahead), then applies it: one append to the data file and in-place
+    updates to the ID store. The journal is cleared only after both are
+    applied, so a crash at any point leaves either nothing or a complete
+    batch to replay - never a record without its ledger entry.
+
+    Assumes it is the only writer of `data_file`.
+    """
+
+    def __init__(self, data_file, store, journal_file=None, batch_size=50, flush_interval=5.0, fsync=True):
+        self.data_file = data_file
+        self.store = store
+        self.journal_file = journal_file or data_file + ".journal"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # One policy for journal, data file and ID store alike
+        self.fsync = fsync
+
+        self.records = []
+        self.updates = []
+        self._first_pending = None
+
+        self.recover()
+
+    # --- QUEUEING ---
+    def add_record(self, manga_id, record):
+        """Queues a captured record; its ID is marked GOOD in the same commit."""
+        self.records.append(record)
+        self.mark(manga_id, GOOD)
+
+    def mark(self, manga_id, state):
+        """Queues an ID status update (BAD after a 404, ERROR after a failure...)."""
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+        self.updates.append((manga_id, state))
+        self.maybe_commit()
+
+    def maybe_commit(self):
+        if not self.updates:
+            return
+        if len(self.updates) >= self.batch_size or time.monotonic() - self._first_pending >= self.flush_interval:
+            self.commit()
+
+    # --- COMMIT ---
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def commit(self):
+        if not self.updates:
+            return
+
+        data_offset = os.path.getsize(self.data_file) if os.path.exists(self.data_file) else 0
+        entry = {"data_offset": data_offset, "records": self.records, "updates": self.updates}
+
+        # 1. Write-ahead: the batch is durable before anything else changes
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._sync(f)
+
+        # 2. Apply, 3. clear the journal
+        self._apply(entry)
+        self._clear_journal()
+
+        self.records = []
+        self.updates = []
+        self._first_pending = None
+
+    def _apply(self, entry):
+        if entry["records"]:
+            with open(self.data_file, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in entry["records"]))
+                self._sync(f)
+
+        for manga_id, state in entry["updates"]:
+            self.store.set(manga_id, state)
+        if self.fsync:
+            self.store.flush()
+
+    def _clear_journal(self):
+        with open(self.journal_file, "w") as f:
+            self._sync(f)
+
+    # --- RECOVERY ---
+    def recover(self):
+        """
+        Replays a batch left in the journal by a crash.
+
+        The data file is first cut back to the offset recorded in the batch,
+        which drops a half-written append, then the batch is applied again.
+        A torn journal line means the batch was never committed: it is dropped.
+        """
+        if not os.path.exists(self.journal_file):
+            return
+
+        entries = []
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+
+        for entry in entries:
+            if os.path.exists(self.data_file) and os.path.getsize(self.data_file) > entry["data_offset"]:
+                with open(self.data_file, "r+b") as f:
+                    f.truncate(entry["data_offset"])
+            self._apply(entry)
+
+        if entries:
+            print(f"Recovered {len(entries)} uncommitted batch(es) from {self.journal_file}")
+        self._clear_journal()
+
+    def close(self):
+        self.commit()
@@ -0,0 +1,179 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from tag_matrix import load_tag_matrix
+
+MIN_SUPPORT = 5   # Pairs/triples carried by fewer manga than this aren't reported
+
+
+class Cooccurrence:
+    """
+    Tag co-occurrence statistics from sparse products over the tag matrix X
+    (one row per manga, one column per tag):
+
+        counts = X^T X            manga carrying both tags (diagonal: each tag alone)
+        sums   = X^T diag(v) X    total of a value column over those manga
+
+    so every pair's count, lift/PMI and mean score/members come out of a few
+    sparse products instead of a loop over each manga's tag list.
+    """
+
+    def __init__(self, tag_matrix, values=None):
+        self.tags = tag_matrix
+        self.vocabulary = tag_matrix.vocabulary
+        self.n = len(tag_matrix)
+        self.X = tag_matrix.matrix.astype(np.float64).tocsr()
+        self._Xt = self.X.T.tocsr()
+        self.counts = (self._Xt @ self.X).tocsr()
+        self.tag_counts = self.counts.diagonal()
+
+        # Per value column: diag(v) X and its pair sums; where values are missing,
+        # also diag(present) X and the pair counts of present values
+        self._weighted, self._present, self.sums, self.valid = {}, {}, {}, {}
+        for name, column in (values or {}).items():
+            column = np.asarray(column, dtype=np.float64)
+            present = np.isfinite(column)
+            self._weighted[name] = (sparse.diags(np.where(present, column, 0.0)) @ self.X).tocsr()
+            self.sums[name] = (self._Xt @ self._weighted[name]).tocsr()
+            if present.all():
+                self._present[name] = None
+                self.valid[name] = self.counts
+            else:
+                self._present[name] = (sparse.diags(present.astype(np.float64)) @ self.X).tocsr()
+                self.valid[name] = (self._Xt @ self._present[name]).tocsr()
+
+    def _tag(self, tag):
+        if tag not in self.tags.index:
+            raise KeyError(f"Unknown tag {tag!r}")
+        return self.tags.index[tag]
+
+    def _frequent_pairs(self, min_support):
+        upper = sparse.triu(self.counts, k=1).tocoo()
+        keep = upper.data >= min_support
+        return upper.row[keep], upper.col[keep], upper.data[keep]
+
+    def pairs(self, min_support=1):
+        """
+        Every tag pair carried by at least `min_support` manga, most frequent first.
+
+        Returns:
+            pd.DataFrame: tag_a, tag_b, count, support, lift, pmi and <value>_mean per pair
+        """
+        a, b, count = self._frequent_pairs(min_support)
+        expected = self.tag_counts[a] * self.tag_counts[b] / self.n if self.n else np.zeros(len(a))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lift = count / expected
+            table = {
+                "tag_a": [self.vocabulary[i] for i in a],
+                "tag_b": [self.vocabulary[j] for j in b],
+                "count": count.astype(np.int64),
+                "support": count / self.n if self.n else count,
+                "lift": lift,
+                "pmi": np.log2(lift),
+            }
+            for name in self.sums:
+                totals = np.asarray(self.sums[name][a, b]).ravel()
+                present = np.asarray(self.valid[name][a, b]).ravel()
+                table[f"{name}_mean"] = totals / present
+        return pd.DataFrame(table).sort_values("count", ascending=False, kind="stable").reset_index(drop=True)
+
+    def triples(self, min_support=MIN_SUPPORT):
+        """
+        Tag triples carried by at least `min_support` manga, mined from the
+        frequent pairs only (a triple can't be more frequent than its pairs).
+
+        Returns:
+            pd.DataFrame: tag_a, tag_b, tag_c, count, support, lift and <value>_mean per triple
+        """
+        a, b, _ = self._frequent_pairs(min_support)
+        columns = ["tag_a", "tag_b", "tag_c", "count", "support", "lift"] + [f"{name}_mean" for name in self.sums]
+        if not len(a):
+            return pd.DataFrame(columns=columns)
+
+        Xc = self.X.tocsc()
+        both = Xc[:, a].multiply(Xc[:, b]).tocsc()            # N x pairs: manga carrying pair p
+        bothT = both.T.tocsr()
+        counts = (bothT @ self.X).tocoo()                      # pairs x tags
+        p, c, count = counts.row, counts.col, counts.data
+        keep = (c > b[p]) & (count >= min_support)             # each triple once, a < b < c
+        p, c, count = p[keep], c[keep], count[keep]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            expected = self.tag_counts[a[p]] * self.tag_counts[b[p]] * self.tag_counts[c] / self.n ** 2
+            table = {
+                "tag_a": [self.vocabulary[i] for i in a[p]],
+                "tag_b": [self.vocabulary[i] for i in b[p]],
+                "tag_c": [self.vocabulary[i] for i in c],
+                "count": count.astype(np.int64),
+                "support": count / self.n,
+                "lift": count / expected,
+            }
+            for name, weighted in self._weighted.items():
+                totals = np.asarray((bothT @ weighted).tocsr()[p, c]).ravel()
+                if self._present[name] is None:
+                    present = count
+                else:
+                    present = np.asarray((bothT @ self._present[name]).tocsr()[p, c]).ravel()
+                table[f"{name}_mean"] = totals / present
+        return pd.DataFrame(table, columns=columns).sort_values("count", ascending=False, kind="stable").reset_index(drop=True)
+
+    def synergy(self, tag, metric="score", min_support=MIN_SUPPORT):
+        """
+        Which tags raise (or lower) `metric` when combined with `tag`.
+
+        uplift is the pair's mean minus the mean of `tag` on its own;
+        partner_uplift is the same against the other tag on its own.
+
+        Returns:
+            pd.DataFrame: tag, count, lift, <metric>_mean, uplift, partner_uplift; best uplift first
+        """
+        if metric not in self.sums:
+            raise KeyError(f"No value column {metric!r} (have {', '.join(self.sums) or 'none'})")
+        i = self._tag(tag)
+        count = self.counts[i].toarray().ravel()
+        totals = self.sums[metric][i].toarray().ravel()
+        present = self.valid[metric][i].toarray().ravel()
+        alone = self.sums[metric].diagonal() / self.valid[metric].diagonal()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = totals / present
+            table = pd.DataFrame({
+                "tag": self.vocabulary,
+                "count": count.astype(np.int64),
+                "lift": count * self.n / (self.tag_counts[i] * self.tag_counts),
+                f"{metric}_mean": mean,
+                "uplift": mean - alone[i],
+                "partner_uplift": mean - alone,
+            })
+        keep = (np.arange(len(self.vocabulary)) != i) & (count >= min_support)
+        return table[keep].sort_values("uplift", ascending=False, kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag pair/triple co-occurrence with lift and score/members stats.")
+    parser.add_argument("dataset", nargs="?", default="final_manga_dataset_clean.csv")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--min-support", type=int, default=MIN_SUPPORT)
+    parser.add_argument("--sort", default="count", help="pair column to rank by (count, lift, pmi, score_mean, ...)")
+    parser.add_argument("--triples", action="store_true", help="also mine triples")
+    parser.add_argument("--synergy", metavar="TAG", help="tags that raise --metric when combined with TAG")
+    parser.add_argument("--metric", default="score", choices=["score", "members"])
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.dataset)
+    engine = Cooccurrence(load_tag_matrix(args.dataset, df),
+                          {"score": pd.to_numeric(df["score"], errors="coerce"),
+                           "members": pd.to_numeric(df["members"], errors="coerce")})
+
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        if args.synergy:
+            print(engine.synergy(args.synergy, args.metric, args.min_support).head(args.top).to_string(index=False))
+        else:
+            pairs = engine.pairs(args.min_support).sort_values(args.sort, ascending=False, kind="stable")
+            print(pairs.head(args.top).to_string(index=False))
+            if args.triples:
+                print()
+                print(engine.triples(args.min_support).head(args.top).to_string(index=False))
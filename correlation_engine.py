@@ -27,6 +27,12 @@ import warnings
 from scipy import stats
 import sys
 import io
+import argparse
+from tag_matrix import load_tag_matrix
+from correlation_kernel import correlation_matrix, target_correlations
+from cooccurrence import Cooccurrence
+from segmentation import segment
+from stage_cache import Pipeline, StageCache, CACHE_DIR, MAX_CACHE_BYTES
 
 # Fix Unicode encoding for Windows
 if sys.platform == 'win32':
@@ -145,13 +151,15 @@ def sanitize_data(df):
 # 3. FEATURE ENGINEERING & ENCODING MODULE
 # ════════════════════════════════════════════════════════════════════════════
 
-def engineer_features(df):
+def engineer_features(df, tag_matrix):
     """
     Transform raw categorical features into numerical features for ML analysis.
-    This converts genre tags and demographics into binary indicators.
+    This converts genre tags and demographics into binary indicators, stored
+    as sparse uint8 columns so memory grows with tag assignments, not rows x genres.
     
     Args:
         df (pd.DataFrame): Cleaned dataframe
+        tag_matrix (TagMatrix): Tag matrix row-aligned with df
     
     Returns:
         tuple: (engineered_dataframe, genre_features, demo_features)
@@ -160,17 +168,18 @@ def engineer_features(df):
     print("STEP 3: FEATURE ENGINEERING & ENCODING")
     print("="*80)
     
-    # Extract genre features from tags
+    # Genre features come straight from the tag matrix - no re-splitting of tag strings
     print("🏷️  Encoding genre tags...")
-    genre_features = df['tags'].str.get_dummies(sep=', ')
+    genre_features = pd.DataFrame.sparse.from_spmatrix(tag_matrix.matrix, index=df.index, columns=tag_matrix.vocabulary)
     print(f"   ✓ Extracted {len(genre_features.columns)} unique genres")
-    print(f"   Top 10 genres: {genre_features.sum().nlargest(10).index.tolist()}")
+    print(f"   Top 10 genres: {tag_matrix.counts().nlargest(10).index.tolist()}")
+    print(f"   Sparse storage: {tag_matrix.matrix.nnz} tag assignments ({genre_features.sparse.density:.1%} of the full grid)")
     
     # Encode demographic information
     print("\n👤 Encoding demographics...")
     demo_features = pd.DataFrame()
     if 'demographic' in df.columns:
-        demo_features = pd.get_dummies(df['demographic'], prefix='Demo')
+        demo_features = pd.get_dummies(df['demographic'], prefix='Demo', sparse=True, dtype=np.uint8)
         print(f"   ✓ Found {len(demo_features.columns)} demographic categories")
         print(f"   Categories: {[col.replace('Demo_', '') for col in demo_features.columns]}")
     
@@ -187,17 +196,35 @@ def engineer_features(df):
     return engineered_df, genre_features, demo_features
 
 
+def aggregate_genres(df, tag_matrix):
+    """
+    Count, mean/std score and mean/std members for every genre in a single
+    grouped pass over the exact tags ("Love" does not match "Boys Love").
+    
+    Args:
+        df (pd.DataFrame): Cleaned dataframe
+        tag_matrix (TagMatrix): Tag matrix row-aligned with df
+    
+    Returns:
+        pd.DataFrame: count, score_mean, score_std, members_mean, members_std per genre
+    """
+    genre_stats = tag_matrix.aggregate({'score': df['score'], 'members': df['members']})
+    print(f"\n📚 Aggregated {len(genre_stats)} genres in one pass")
+    return genre_stats
+
+
 # ════════════════════════════════════════════════════════════════════════════
 # 4. EXPLORATORY DATA ANALYSIS (EDA) MODULE
 # ════════════════════════════════════════════════════════════════════════════
 
-def perform_eda(df, engineered_df):
+def perform_eda(df, engineered_df, genre_stats):
     """
     Perform comprehensive exploratory data analysis with multiple visualizations.
     
     Args:
         df (pd.DataFrame): Original dataframe with raw features
         engineered_df (pd.DataFrame): Engineered dataframe with encoded features
+        genre_stats (pd.DataFrame): Per-genre aggregates (see aggregate_genres)
     """
     print("\n" + "="*80)
     print("STEP 4: EXPLORATORY DATA ANALYSIS (EDA)")
@@ -277,18 +304,9 @@ def perform_eda(df, engineered_df):
     # ─────────────────────────────────────────────────────────────────────────
     print("\n🏷️  GENRE ANALYSIS")
     
-    # Extract all genres from tags
-    all_genres = []
-    for tags in df['tags'].dropna():
-        all_genres.extend([tag.strip() for tag in str(tags).split(',')])
-    
-    genre_counts = pd.Series(all_genres).value_counts().head(15)
-    genre_scores = {}
-    for genre in genre_counts.index:
-        mask = df['tags'].str.contains(genre, na=False)
-        genre_scores[genre] = df[mask]['score'].mean()
-    
-    genre_scores_series = pd.Series(genre_scores).sort_values(ascending=False)
+    # Counts and average scores straight from the per-genre aggregates
+    genre_counts = genre_stats['count'].sort_values(ascending=False, kind='stable').head(15)
+    genre_scores_series = genre_stats.loc[genre_counts.index, 'score_mean'].sort_values(ascending=False)
     
     fig, axes = plt.subplots(1, 2, figsize=(16, 6))
     
@@ -322,15 +340,16 @@ def perform_correlation_analysis(engineered_df):
         engineered_df (pd.DataFrame): Engineered dataframe with features
     
     Returns:
-        tuple: (correlation_matrix, score_drivers, popularity_drivers)
+        tuple: (driver_correlations, score_drivers, popularity_drivers)
     """
     print("\n" + "="*80)
     print("STEP 5: CORRELATION ANALYSIS")
     print("="*80)
     
-    # Calculate full correlation matrix
-    print("🔗 Computing Pearson correlation matrix...")
-    corr_matrix = engineered_df.corr(numeric_only=True)
+    # Only score and members are read, so correlate every feature against just those two
+    # (linear in the number of features); the full pairwise matrix is built for the heatmap only
+    print("🔗 Computing Pearson correlations with score and members...")
+    corr_matrix = target_correlations(engineered_df, ['score', 'members'])
     
     # Extract drivers for key metrics
     score_drivers = corr_matrix['score'].sort_values(ascending=False)
@@ -380,7 +399,7 @@ def perform_correlation_analysis(engineered_df):
     
     # Select top features by absolute correlation with score
     top_features_idx = score_drivers.abs().sort_values(ascending=False).head(20).index
-    top_corr_matrix = engineered_df[top_features_idx].corr()
+    top_corr_matrix = correlation_matrix(engineered_df[top_features_idx])
     
     plt.figure(figsize=(14, 12))
     sns.heatmap(
@@ -408,7 +427,7 @@ def perform_correlation_analysis(engineered_df):
 # 6. GENRE TREND PREDICTION MODULE (Linear Regression)
 # ════════════════════════════════════════════════════════════════════════════
 
-def predict_genre_trends(engineered_df, df_original):
+def predict_genre_trends(engineered_df, df_original, genre_stats):
     """
     Predict which genres will skyrocket in the next 5 years using linear regression.
     Analyzes current genre performance and projects future trends.
@@ -416,6 +435,7 @@ def predict_genre_trends(engineered_df, df_original):
     Args:
         engineered_df (pd.DataFrame): Engineered dataframe
         df_original (pd.DataFrame): Original dataframe
+        genre_stats (pd.DataFrame): Per-genre aggregates (see aggregate_genres)
     
     Returns:
         dict: Predictions for each genre
@@ -424,43 +444,25 @@ def predict_genre_trends(engineered_df, df_original):
     print("STEP 6: GENRE TREND PREDICTION (5-Year Forecast)")
     print("="*80)
     
-    # Extract all unique genres
-    all_genres = []
-    for tags in df_original['tags'].dropna():
-        all_genres.extend([tag.strip() for tag in str(tags).split(',')])
+    print(f"🔮 Analyzing {len(genre_stats)} unique genres for trend prediction...")
     
-    unique_genres = list(set(all_genres))
+    # Trend metrics for every genre at once from the aggregates (exact tags)
+    eligible = genre_stats[genre_stats['count'] >= 3]  # Skip genres with too few entries
+    volatility = eligible['members_std'] / (eligible['members_mean'] + 1)  # Volatility metric
     
-    print(f"🔮 Analyzing {len(unique_genres)} unique genres for trend prediction...")
+    # Simple trend indicator based on score and member distribution
+    # Higher score + higher members = established success
+    # High volatility + high score = emerging trend
+    trend_score = (eligible['score_mean'] / 10) * 0.4 + (np.log10(eligible['members_mean']) / 6) * 0.4 + (volatility * 0.5) * 0.2
     
     predictions = {}
-    
-    # For each genre, calculate trend metrics and predict
-    for genre in unique_genres:
-        mask = df_original['tags'].str.contains(genre, na=False, case=False)
-        genre_data = df_original[mask]
-        
-        if len(genre_data) < 3:  # Skip genres with too few entries
-            continue
-        
-        # Metrics for this genre
-        count = len(genre_data)
-        avg_score = genre_data['score'].mean()
-        avg_members = genre_data['members'].mean()
-        avg_growth = genre_data['members'].std() / (genre_data['members'].mean() + 1)  # Volatility metric
-        
-        # Simple trend indicator based on score and member distribution
-        # Higher score + higher members = established success
-        # High volatility + high score = emerging trend
-        
-        trend_score = (avg_score / 10) * 0.4 + (np.log10(avg_members) / 6) * 0.4 + (avg_growth * 0.5) * 0.2
-        
+    for genre in eligible.index:
         predictions[genre] = {
-            'count': count,
-            'avg_score': avg_score,
-            'avg_members': avg_members,
-            'volatility': avg_growth,
-            'trend_strength': trend_score
+            'count': int(eligible.at[genre, 'count']),
+            'avg_score': eligible.at[genre, 'score_mean'],
+            'avg_members': eligible.at[genre, 'members_mean'],
+            'volatility': volatility[genre],
+            'trend_strength': trend_score[genre]
         }
     
     # Sort by trend strength
@@ -534,7 +536,7 @@ def predict_genre_trends(engineered_df, df_original):
 # 7. QUALITY VS POPULARITY ANALYSIS MODULE
 # ════════════════════════════════════════════════════════════════════════════
 
-def analyze_quality_vs_popularity(df, engineered_df):
+def analyze_quality_vs_popularity(df, engineered_df, quantiles=None, absolute=None):
     """
     Analyze the relationship between quality (score) and popularity (members).
     Identify high-quality cult classics vs viral hits.
@@ -542,39 +544,28 @@ def analyze_quality_vs_popularity(df, engineered_df):
     Args:
         df (pd.DataFrame): Original dataframe
         engineered_df (pd.DataFrame): Engineered dataframe
+        quantiles (dict): Quantile cutoffs overriding the quartiles, e.g. {'score': {'high': 0.9}}
+        absolute (dict): Fixed cutoffs overriding quantiles, e.g. {'members': {'high': 100000}}
     """
     print("\n" + "="*80)
     print("STEP 7: QUALITY vs POPULARITY ANALYSIS")
     print("="*80)
     
-    # Calculate quartiles for classification
-    score_q3 = engineered_df['score'].quantile(0.75)
-    members_q3 = engineered_df['members'].quantile(0.75)
-    score_q1 = engineered_df['score'].quantile(0.25)
-    members_q1 = engineered_df['members'].quantile(0.25)
-    
-    # Classify manga into categories
-    def classify_manga(row):
-        if row['score'] >= score_q3 and row['members'] >= members_q3:
-            return 'Masterpiece'
-        elif row['score'] >= score_q3 and row['members'] < members_q1:
-            return 'Cult Classic'
-        elif row['score'] < score_q1 and row['members'] >= members_q3:
-            return 'Viral Hit'
-        elif row['score'] >= score_q3 and row['members'] >= members_q1 and row['members'] < members_q3:
-            return 'Quality Hidden Gem'
-        else:
-            return 'Average'
-    
-    engineered_df['category'] = engineered_df.apply(classify_manga, axis=1)
-    df['category'] = engineered_df['category']
+    # Classify manga into categories: whole-column comparisons against the
+    # cutoffs (quartiles unless overridden), with per-category summaries
+    labels, summary, cutoffs = segment(engineered_df, quantiles, absolute)
+    engineered_df['category'] = labels
+    df['category'] = labels
+    
+    print(f"\n✓ Cutoffs: score {cutoffs['score']['low']:.2f} / {cutoffs['score']['high']:.2f}, "
+          f"members {cutoffs['members']['low']:.0f} / {cutoffs['members']['high']:.0f}")
     
     # Print category analysis
     print("\n📊 MANGA CLASSIFICATION ANALYSIS")
-    category_counts = engineered_df['category'].value_counts()
+    category_counts = summary['count'][summary['count'] > 0].sort_values(ascending=False, kind='stable')
     print("\nManga Distribution by Category:")
     for category, count in category_counts.items():
-        pct = (count / len(engineered_df)) * 100
+        pct = summary.at[category, 'share'] * 100
         print(f"   • {category:20s}: {count:4d} ({pct:5.1f}%)")
     
     # Analyze each category
@@ -582,13 +573,12 @@ def analyze_quality_vs_popularity(df, engineered_df):
     print("📈 CATEGORY CHARACTERISTICS")
     print("="*80)
     
-    for category in ['Masterpiece', 'Cult Classic', 'Viral Hit', 'Quality Hidden Gem', 'Average']:
-        cat_data = engineered_df[engineered_df['category'] == category]
-        if len(cat_data) > 0:
+    for category, row in summary.iterrows():
+        if row['count'] > 0:
             print(f"\n{category}:")
-            print(f"   Average Score: {cat_data['score'].mean():.2f}")
-            print(f"   Average Members: {cat_data['members'].mean():.0f}")
-            print(f"   Count: {len(cat_data)}")
+            print(f"   Average Score: {row['score_mean']:.2f}")
+            print(f"   Average Members: {row['members_mean']:.0f}")
+            print(f"   Count: {int(row['count'])}")
             
             # Show top examples
             top_examples = df[df['category'] == category].nlargest(3, 'score')[['title', 'score', 'members']]
@@ -638,13 +628,15 @@ def analyze_quality_vs_popularity(df, engineered_df):
 # 8. GENRE RECOMMENDATIONS ENGINE
 # ════════════════════════════════════════════════════════════════════════════
 
-def generate_recommendations(df, predictions):
+def generate_recommendations(df, predictions, tag_matrix, genre_stats):
     """
     Generate strategic recommendations for manga creators based on data analysis.
     
     Args:
         df (pd.DataFrame): Original dataframe
         predictions (dict): Genre trend predictions
+        tag_matrix (TagMatrix): Tag matrix row-aligned with df
+        genre_stats (pd.DataFrame): Per-genre aggregates (see aggregate_genres)
     """
     print("\n" + "="*80)
     print("STEP 8: STRATEGIC RECOMMENDATIONS")
@@ -657,6 +649,7 @@ def generate_recommendations(df, predictions):
     print("   These genres show strong potential for success in the next 5 years:")
     
     sorted_genres = sorted(predictions.items(), key=lambda x: x[1]['trend_strength'], reverse=True)
+    ranked_stats = genre_stats.loc[[genre for genre, _ in sorted_genres]]  # Aggregates in trend order
     for i, (genre, metrics) in enumerate(sorted_genres[:5], 1):
         print(f"   {i}. {genre:25s} (Trend Score: {metrics['trend_strength']:.3f})")
         print(f"      → Target Score: {metrics['avg_score']:.1f}+")
@@ -666,37 +659,32 @@ def generate_recommendations(df, predictions):
     print("   High quality but less saturated - good for differentiation:")
     
     # Find high-scoring but lower-count genres
-    niche_genres = [(g, m) for g, m in sorted_genres if 3 <= m['count'] <= 20 and m['avg_score'] >= 7.5]
-    for i, (genre, metrics) in enumerate(niche_genres[:5], 1):
-        print(f"   {i}. {genre:25s} (Score: {metrics['avg_score']:.2f}, Count: {metrics['count']})")
+    niche_genres = ranked_stats[ranked_stats['count'].between(3, 20) & (ranked_stats['score_mean'] >= 7.5)]
+    for i, (genre, row) in enumerate(niche_genres.head(5).iterrows(), 1):
+        print(f"   {i}. {genre:25s} (Score: {row['score_mean']:.2f}, Count: {int(row['count'])})")
     
     print("\n⚠️  SATURATED MARKETS (Competitive, Harder to Stand Out):")
     print("   High competition - need to offer unique angles:")
     
-    saturated = [(g, m) for g, m in sorted_genres if m['count'] > 50]
-    for i, (genre, metrics) in enumerate(saturated[:5], 1):
-        print(f"   {i}. {genre:25s} (Frequency: {metrics['count']}, Avg Score: {metrics['avg_score']:.2f})")
+    saturated = ranked_stats[ranked_stats['count'] > 50]
+    for i, (genre, row) in enumerate(saturated.head(5).iterrows(), 1):
+        print(f"   {i}. {genre:25s} (Frequency: {int(row['count'])}, Avg Score: {row['score_mean']:.2f})")
     
     print("\n📊 COMBINATION STRATEGIES (Genre Pairs with Strong Synergy):")
     print("   Popular combinations that tend to perform well together:")
     
-    # Find top genre pairs
-    all_genres = []
-    for tags in df['tags'].dropna():
-        genres_list = [tag.strip() for tag in str(tags).split(',')]
-        all_genres.append(genres_list)
-    
-    genre_pairs = {}
-    for genres_list in all_genres:
-        if len(genres_list) >= 2:
-            for i in range(len(genres_list)):
-                for j in range(i+1, len(genres_list)):
-                    pair = tuple(sorted([genres_list[i], genres_list[j]]))
-                    genre_pairs[pair] = genre_pairs.get(pair, 0) + 1
+    # Find top genre pairs: counts, lift and average score for every pair at once (sparse X^T X)
+    cooccurrence = Cooccurrence(tag_matrix, {'score': df['score'], 'members': df['members']})
+    top_pairs = cooccurrence.pairs().head(5)
+    for i, (_, pair) in enumerate(top_pairs.iterrows(), 1):
+        print(f"   {i}. {pair['tag_a']} + {pair['tag_b']:25s} ({pair['count']} manga, lift {pair['lift']:.2f}, avg score {pair['score_mean']:.2f})")
     
-    top_pairs = sorted(genre_pairs.items(), key=lambda x: x[1], reverse=True)[:5]
-    for i, (pair, count) in enumerate(top_pairs, 1):
-        print(f"   {i}. {pair[0]} + {pair[1]:25s} ({count} manga)")
+    if sorted_genres:
+        anchor = sorted_genres[0][0]
+        print(f"\n🤝 SYNERGY WITH {anchor.upper()} (Tags that raise the average score when combined):")
+        synergy = cooccurrence.synergy(anchor, 'score')
+        for i, (_, row) in enumerate(synergy[synergy['uplift'] > 0].head(5).iterrows(), 1):
+            print(f"   {i}. {anchor} + {row['tag']:25s} (Score: {row['score_mean']:.2f}, {row['uplift']:+.2f} vs {anchor} alone, {row['count']} manga)")
 
 
 # ════════════════════════════════════════════════════════════════════════════
@@ -797,7 +785,7 @@ def generate_statistical_insights(engineered_df, df_original):
 # 10. COMPREHENSIVE SUMMARY & EXPORT
 # ════════════════════════════════════════════════════════════════════════════
 
-def generate_final_report(df, engineered_df, predictions):
+def generate_final_report(df, engineered_df, predictions, tag_matrix):
     """
     Generate a comprehensive final summary report.
     
@@ -805,6 +793,7 @@ def generate_final_report(df, engineered_df, predictions):
         df (pd.DataFrame): Original dataframe
         engineered_df (pd.DataFrame): Engineered dataframe
         predictions (dict): Genre predictions
+        tag_matrix (TagMatrix): Tag matrix row-aligned with df
     """
     print("\n" + "="*80)
     print("FINAL COMPREHENSIVE REPORT")
@@ -821,11 +810,9 @@ def generate_final_report(df, engineered_df, predictions):
     print(f"  • Popularity Range: {engineered_df['members'].min():.0f} - {engineered_df['members'].max():.0f} members")
     
     print(f"\n✓ Genre Landscape:")
-    all_genres = []
-    for tags in df['tags'].dropna():
-        all_genres.extend([tag.strip() for tag in str(tags).split(',')])
-    print(f"  • Total Unique Genres: {len(set(all_genres))}")
-    print(f"  • Most Common Genre: {max(set(all_genres), key=all_genres.count)}")
+    genre_counts = tag_matrix.counts()
+    print(f"  • Total Unique Genres: {tag_matrix.n_tags}")
+    print(f"  • Most Common Genre: {genre_counts.idxmax() if len(genre_counts) else 'n/a'}")
     
     print(f"\n✓ Demographic Insights:")
     demos = df['demographic'].nunique()
@@ -869,10 +856,22 @@ and popularity. Key findings:
 # MAIN EXECUTION FUNCTION
 # ════════════════════════════════════════════════════════════════════════════
 
-def run_correlation_engine():
+def run_correlation_engine(use_cache=True, cache_dir=CACHE_DIR, max_cache_bytes=MAX_CACHE_BYTES,
+                           segment_quantiles=None, segment_absolute=None):
     """
     Main orchestration function that runs the complete manga analysis pipeline.
     Calls all analysis modules in sequence to provide comprehensive insights.
+    
+    Each step is a cached stage keyed by its inputs and parameters (see
+    stage_cache.py): an unchanged dataset replays the previous run, and a
+    changed parameter recomputes only the steps downstream of it.
+    
+    Args:
+        use_cache (bool): Reuse cached stage results
+        cache_dir (str): Where stage results are kept
+        max_cache_bytes (int): Cache size limit (least recently used results are evicted)
+        segment_quantiles (dict): Quantile cutoffs for step 7 (see segmentation.py)
+        segment_absolute (dict): Absolute cutoffs for step 7
     """
     
     print("\n")
@@ -880,37 +879,66 @@ def run_correlation_engine():
     print("MANGA SUCCESS ANALYTICS ENGINE - COMPREHENSIVE ANALYSIS".center(80))
     print("=" * 80)
     
+    def prepare(df, dataset):
+        # Tags are parsed once into the tag matrix (persisted next to the dataset)
+        tag_matrix = load_tag_matrix(dataset, df)
+        df_clean = sanitize_data(df)
+        return df_clean, tag_matrix.take(df.index.get_indexer(df_clean.index))
+    
+    pipeline = Pipeline(StageCache(cache_dir, max_cache_bytes) if use_cache else None)
+    pipeline.source('dataset', INPUT_FILE)
+    
     # STEP 1: Load data
-    df = load_and_validate_data(INPUT_FILE)
-    if df is None:
-        return
+    pipeline.stage('load', load_and_validate_data, deps=['dataset'])
+    
+    # STEP 2: Sanitize data -> (df_clean, tag_matrix)
+    pipeline.stage('prepare', prepare, deps=['load', 'dataset'])
     
-    # STEP 2: Sanitize data
-    df_clean = sanitize_data(df)
+    # STEP 3: Engineer features -> (engineered_df, genre_features, demo_features)
+    pipeline.stage('features', lambda prepared: engineer_features(*prepared), deps=['prepare'])
     
-    # STEP 3: Engineer features
-    engineered_df, genre_features, demo_features = engineer_features(df_clean)
+    # Per-genre count / mean / std in one pass, shared by EDA, trends and recommendations
+    pipeline.stage('genre_stats', lambda prepared: aggregate_genres(*prepared), deps=['prepare'])
     
     # STEP 4: Perform EDA
-    perform_eda(df_clean, engineered_df)
+    pipeline.stage('eda', lambda prepared, features, genre_stats: perform_eda(prepared[0], features[0], genre_stats),
+                   deps=['prepare', 'features', 'genre_stats'],
+                   outputs=['01_eda_distributions.png', '02_eda_demographics.png', '03_genre_analysis.png'])
     
     # STEP 5: Correlation analysis
-    corr_matrix, score_drivers, popularity_drivers = perform_correlation_analysis(engineered_df)
+    pipeline.stage('correlations', lambda features: perform_correlation_analysis(features[0]),
+                   deps=['features'], outputs=['04_correlation_heatmap.png'])
     
     # STEP 6: Genre trend prediction
-    predictions = predict_genre_trends(engineered_df, df_clean)
+    pipeline.stage('predictions', lambda prepared, features, genre_stats: predict_genre_trends(features[0], prepared[0], genre_stats),
+                   deps=['prepare', 'features', 'genre_stats'], outputs=['05_genre_trends_prediction.png'])
     
     # STEP 7: Quality vs Popularity analysis
-    analyze_quality_vs_popularity(df_clean, engineered_df)
+    pipeline.stage('segments', lambda prepared, features, **cutoffs: analyze_quality_vs_popularity(prepared[0].copy(), features[0].copy(), **cutoffs),
+                   deps=['prepare', 'features'], params={'quantiles': segment_quantiles, 'absolute': segment_absolute},
+                   outputs=['06_quality_vs_popularity.png'])
     
     # STEP 8: Recommendations
-    generate_recommendations(df_clean, predictions)
+    pipeline.stage('recommendations', lambda prepared, predictions, genre_stats: generate_recommendations(prepared[0], predictions, prepared[1], genre_stats),
+                   deps=['prepare', 'predictions', 'genre_stats'])
     
     # STEP 9: Statistical insights
-    generate_statistical_insights(engineered_df, df_clean)
+    pipeline.stage('insights', lambda prepared, features: generate_statistical_insights(features[0], prepared[0]),
+                   deps=['prepare', 'features'])
     
     # STEP 10: Final report
-    generate_final_report(df_clean, engineered_df, predictions)
+    pipeline.stage('report', lambda prepared, features, predictions: generate_final_report(prepared[0], features[0], predictions, prepared[1]),
+                   deps=['prepare', 'features', 'predictions'])
+    
+    pipeline.run('load')
+    if pipeline.value('load') is None:
+        return
+    pipeline.run()
+    
+    cached, computed = pipeline.summary()
+    if use_cache:
+        print(f"\n♻️  Stages reused from cache: {', '.join(cached) or 'none'}")
+        print(f"⚙️  Stages recomputed: {', '.join(computed) or 'none'}")
 
 
 # ════════════════════════════════════════════════════════════════════════════
@@ -918,4 +946,14 @@ def run_correlation_engine():
 # ════════════════════════════════════════════════════════════════════════════
 
 if __name__ == "__main__":
-    run_correlation_engine()
+    parser = argparse.ArgumentParser(description="Run the manga success analysis pipeline.")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every stage (nothing is read or written)")
+    parser.add_argument("--clear-cache", action="store_true", help="empty the stage cache first")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--cache-size-mb", type=int, default=MAX_CACHE_BYTES // 1024 ** 2)
+    args = parser.parse_args()
+    
+    if args.clear_cache:
+        StageCache(args.cache_dir).clear()
+    run_correlation_engine(use_cache=not args.no_cache, cache_dir=args.cache_dir,
+                           max_cache_bytes=args.cache_size_mb * 1024 ** 2)
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def numeric_blocks(df):
+    """
+    The numeric columns of `df` in two blocks, neither densified from sparse:
+
+        dense:  N x d float array of the ordinary numeric/bool columns
+        matrix: N x s CSR matrix of the pandas SparseDtype columns (the one-hot features)
+
+    Returns:
+        tuple: (dense, dense_names, matrix, sparse_names)
+    """
+    dense_names, sparse_names = [], []
+    for name in df.columns:
+        dtype = df[name].dtype
+        if isinstance(dtype, pd.SparseDtype):
+            sparse_names.append(name)
+        elif pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+            dense_names.append(name)
+
+    dense = df[dense_names].to_numpy(dtype=np.float64) if dense_names else np.empty((len(df), 0))
+    if sparse_names:
+        matrix = df[sparse_names].sparse.to_coo().tocsr().astype(np.float64)
+    else:
+        matrix = sparse.csr_matrix((len(df), 0))
+    return dense, dense_names, matrix, sparse_names
+
+
+def _complete_rows(dense, matrix):
+    """Rows without a missing dense value (pandas drops them pair by pair; here once)."""
+    keep = np.isfinite(dense).all(axis=1)
+    if keep.all():
+        return dense, matrix
+    return dense[keep], matrix[keep]
+
+
+def correlation_matrix(df):
+    """
+    Pearson correlation of every numeric column of `df`, like
+    df.corr(numeric_only=True), computed from the sparse block's Gram matrix
+    (X^T X) so the one-hot columns are never expanded to N x s.
+
+    Dense columns are centred first; for the sparse ones the mean is taken
+    out of the Gram matrix afterwards, which is exact enough for 0/1 values.
+    Constant columns correlate as NaN, as in pandas.
+    """
+    dense, dense_names, matrix, sparse_names = numeric_blocks(df)
+    dense, matrix = _complete_rows(dense, matrix)
+    n = dense.shape[0]
+    names = dense_names + sparse_names
+    if n < 2:
+        return pd.DataFrame(np.nan, index=names, columns=names)
+
+    centred = dense - dense.mean(axis=0)
+    sums = np.asarray(matrix.sum(axis=0)).ravel()
+    dd = centred.T @ centred
+    dx = np.asarray((matrix.T @ centred).T)                       # sum x * (d - mean d) = centred cross products
+    xx = (matrix.T @ matrix).toarray() - np.outer(sums, sums) / n
+    cov = np.block([[dd, dx], [dx.T, xx]]) / (n - 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sd = np.sqrt(np.diag(cov))
+        corr = np.clip(cov / np.outer(sd, sd), -1.0, 1.0)
+    corr[:, sd == 0] = np.nan
+    corr[sd == 0, :] = np.nan
+    return pd.DataFrame(corr, index=names, columns=names)
+
+
+def target_correlations(df, targets):
+    """
+    Pearson correlation of every numeric column of `df` with each column in
+    `targets`, in O(N * F): each target is standardised once and multiplied
+    into the feature matrix (X^T z, sparse columns included), where the full
+    matrix costs O(N * F^2). Targets must be ordinary (dense) numeric columns.
+
+    Returns:
+        pd.DataFrame: one row per numeric column, one column per target
+    """
+    dense, dense_names, matrix, sparse_names = numeric_blocks(df)
+    missing = [target for target in targets if target not in dense_names]
+    if missing:
+        raise KeyError(f"Not dense numeric columns: {missing}")
+    dense, matrix = _complete_rows(dense, matrix)
+    n = dense.shape[0]
+    names = dense_names + sparse_names
+    if n < 2:
+        return pd.DataFrame(np.nan, index=names, columns=list(targets))
+
+    centred = dense - dense.mean(axis=0)
+    dense_sd = np.sqrt((centred ** 2).sum(axis=0) / (n - 1))
+    sums = np.asarray(matrix.sum(axis=0)).ravel()
+    squares = np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel()
+    sparse_sd = np.sqrt(np.maximum(squares - sums ** 2 / n, 0.0) / (n - 1))
+    sd = np.concatenate([dense_sd, sparse_sd])
+
+    positions = [dense_names.index(target) for target in targets]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = centred[:, positions] / dense_sd[positions]
+        # sum x * z needs no centring of x: z sums to zero
+        cross = np.vstack([centred.T @ z, np.asarray(matrix.T @ z)])
+        corr = np.clip(cross / ((n - 1) * sd[:, None]), -1.0, 1.0)
+    corr[sd == 0, :] = np.nan
+    return pd.DataFrame(corr, index=names, columns=list(targets))
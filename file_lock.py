@@ -0,0 +1,69 @@
+import os
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LockHeld(RuntimeError):
+    """Another process already holds the lock."""
+
+
+class FileLock:
+    """
+    Exclusive lock on `path` (created if missing), held from acquire() until
+    release() or until the process exits, so a crash never leaves it stuck.
+
+    It never waits: while another process holds it, acquire() raises
+    LockHeld naming that process (its pid is written into the file).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def acquire(self):
+        if self._f is not None:
+            return self
+        f = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            try:
+                f.seek(0)
+                owner = f.read().strip() or "?"
+            except OSError:
+                owner = "?"
+            f.close()
+            raise LockHeld(f"{self.path} is held by another process (pid {owner})") from None
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._f = f
+        return self
+
+    def release(self):
+        if self._f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
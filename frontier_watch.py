@@ -0,0 +1,215 @@
+"""
+Watches the top of the ID space for new releases.
+
+New manga get IDs above the current maximum, so a 404 just above the
+highest known good ID only means "not yet". Every pass re-probes a window
+around that frontier; the window slides up as new titles turn up.
+
+    python frontier_watch.py            # a pass every INTERVAL_HOURS, forever
+    python frontier_watch.py --once     # a single pass (for cron)
+
+It works the linux scraper's ledger and dataset, so a pass is skipped
+while that scraper (or shard_scraper.py) holds them: two writers would
+clobber each other's journal, and two limiters would double the request
+rate against Jikan's quotas. In-process callers can pass their limiter.
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+
+from file_lock import FileLock, LockHeld
+from id_store import open_store, UNKNOWN, GOOD, BAD
+from manga_scraper import Scraper, load_config
+
+script_dir=os.path.dirname(os.path.abspath(__file__))
+
+# --- FILES ---
+WATCH_STATE_FILE = os.path.join(script_dir,"frontier_state_1.json")   # When each window ID was last checked
+
+# --- WINDOW ---
+AHEAD = 500                # IDs above the frontier probed every pass
+BEHIND = 2000              # IDs below it whose blacklist entries expire
+AHEAD_RECHECK_HOURS = 6    # A 404 above the frontier is retried after this long...
+EXPIRE_DAYS = 30           # ...one below it after this long
+INTERVAL_HOURS = 6
+
+# --- FRONTIER ---
+# The top of the last block that still has a few good IDs, so one stray high ID
+# doesn't drag the window into empty space
+FRONTIER_BLOCK = 1000
+FRONTIER_MIN_GOOD = 5
+
+
+def find_frontier(store, block_size=FRONTIER_BLOCK, min_good=FRONTIER_MIN_GOOD):
+    """Highest good ID in the last block holding at least `min_good` good IDs (0 if none)."""
+    blocks = store.block_counts(block_size)
+    for index in range(len(blocks) - 1, -1, -1):
+        if blocks[index][GOOD] >= min_good:
+            for manga_id in range(min((index + 1) * block_size - 1, store.high), index * block_size, -1):
+                if store.get(manga_id) == GOOD:
+                    return manga_id
+    return 0
+
+
+def load_watch_state():
+    if os.path.exists(WATCH_STATE_FILE):
+        with open(WATCH_STATE_FILE, "r") as f:
+            state = json.load(f)
+        state["checked"] = {int(manga_id): ts for manga_id, ts in state["checked"].items()}
+        return state
+    return {"frontier": 0, "checked": {}}
+
+
+def save_watch_state(state):
+    tmp_file = WATCH_STATE_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, WATCH_STATE_FILE)
+
+
+class FrontierScheduler:
+    """
+    IDs from frontier - BEHIND up to frontier + AHEAD, ascending, that are
+    due. The upper end follows `watcher.frontier`, so a find extends the pass.
+    Like SweepScheduler, it yields None while `in_flight` requests may
+    still requeue their ID.
+    """
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self.retry = deque()
+        self.in_flight = 0
+        self.remaining = sum(1 for _ in self._window())
+
+    def _window(self):
+        now = time.time()
+        manga_id = max(1, self.watcher.frontier - self.watcher.behind)
+        while manga_id <= min(self.watcher.frontier + self.watcher.ahead, self.watcher.store.high):
+            if self.watcher.is_due(manga_id, now):
+                yield manga_id
+            manga_id += 1
+
+    def requeue(self, manga_id):
+        self.retry.append(manga_id)
+        self.remaining += 1
+
+    def __iter__(self):
+        for manga_id in self._window():
+            while self.retry:
+                self.remaining -= 1
+                yield self.retry.popleft()
+            self.remaining = max(0, self.remaining - 1)
+            yield manga_id
+        while self.retry or self.in_flight:
+            if self.retry:
+                self.remaining -= 1
+                yield self.retry.popleft()
+            else:
+                yield None
+
+    def save(self):
+        pass
+
+    def progress(self):
+        return 0.0
+
+
+class FrontierWatcher(Scraper):
+    """
+    One pass over the frontier window.
+
+    Blacklist entries in the window that were last checked too long ago are
+    reset to UNKNOWN first (expired), so even an interrupted pass leaves them
+    to the main scraper instead of blacklisted forever. Finds are appended to
+    the dataset as they come in, through the usual batched writer.
+    """
+
+    def __init__(self, config, state, ahead=AHEAD, behind=BEHIND,
+                 ahead_recheck=AHEAD_RECHECK_HOURS * 3600, expire_after=EXPIRE_DAYS * 86400, limiter=None):
+        self.state = state
+        self.ahead = ahead
+        self.behind = behind
+        self.ahead_recheck = ahead_recheck
+        self.expire_after = expire_after
+        self.found = 0
+        super().__init__(config, limiter=limiter)
+
+    def make_scheduler(self):
+        self.frontier = max(find_frontier(self.store), self.state["frontier"])
+        self._expire()
+        return FrontierScheduler(self)
+
+    def is_due(self, manga_id, now):
+        """Unprobed/failed IDs always; blacklisted ones once their last check is old enough."""
+        state = self.store.get(manga_id)
+        if state == GOOD:
+            return False
+        if state != BAD:
+            return True
+        ttl = self.ahead_recheck if manga_id > self.frontier else self.expire_after
+        return now - self.state["checked"].get(manga_id, 0) >= ttl
+
+    def _expire(self):
+        """Resets due blacklist entries in the window and forgets checks outside it."""
+        now = time.time()
+        low = max(1, self.frontier - self.behind)
+        high = min(self.frontier + self.ahead, self.store.high)
+        self.state["checked"] = {manga_id: ts for manga_id, ts in self.state["checked"].items() if low <= manga_id}
+        expired = 0
+        for manga_id in range(low, high + 1):
+            if self.store.get(manga_id) == BAD and self.is_due(manga_id, now):
+                self.store.set(manga_id, UNKNOWN)
+                expired += 1
+        self.store.flush()
+        print(f"Frontier at ID {self.frontier}: window {low}..{high}, {expired} blacklist entries expired")
+
+    def handle(self, manga_id, response, started):
+        super().handle(manga_id, response, started)
+        if response.status_code in (200, 404):
+            self.state["checked"][manga_id] = int(time.time())
+        if response.status_code == 200:
+            self.found += 1
+            if manga_id > self.frontier:
+                self.frontier = manga_id
+                self.state["frontier"] = manga_id
+
+    def close(self):
+        super().close()
+        save_watch_state(self.state)
+
+
+def watch_config():
+    config = load_config("linux", overrides={"async": False, "max_consecutive_failures": 50, "log_level": "all"})
+    # Room above the frontier: the ledger grows instead of rejecting new IDs
+    # (growing it under a running scraper would pull the file from under its mmap)
+    with FileLock(config["state_file"] + ".lock"), open_store(config["state_file"], config["high"], config["good_ids_file"], config["bad_ids_file"]) as store:
+        frontier = find_frontier(store)
+    config["high"] = max(config["high"], frontier + AHEAD * 2)
+    return config
+
+
+def run_pass(limiter=None):
+    """One pass; skipped (returns False) while a scraper holds the ledger."""
+    try:
+        watcher = FrontierWatcher(watch_config(), load_watch_state(), limiter=limiter)
+    except LockHeld as e:
+        print(f"Scraper running ({e}); skipping this pass")
+        return False
+    watcher.run()
+    print(f"Pass done. {watcher.found} new, frontier now at ID {watcher.frontier}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-probe the ID window around the newest known manga.")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    args = parser.parse_args()
+
+    while True:
+        run_pass()
+        if args.once:
+            break
+        print(f"Next pass in {INTERVAL_HOURS}h")
+        time.sleep(INTERVAL_HOURS * 3600)
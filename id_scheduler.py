@@ -0,0 +1,151 @@
+import json
+import math
+import os
+import random
+from collections import deque
+
+
+class SweepScheduler:
+    """
+    Walks every ID in low..high exactly once, in a seeded shuffled order,
+    yielding only the IDs `is_done` says still need probing.
+
+    The order is the affine permutation  index -> (a*index + c) mod n  with
+    gcd(a, n) == 1, so no visited-set is needed and each ID costs O(1) no
+    matter how much of the range is already classified. The cursor, the
+    seed that fixes the order and the IDs waiting to be retried are saved to
+    `state_file` so a restart resumes where the last run stopped.
+
+    Once the walk is through, up to `retry_passes` more passes (per run)
+    walk the range again for IDs still not done: failures (ERROR) and IDs
+    whose result was lost to a crash (still UNKNOWN) get another try instead
+    of being left behind the cursor for good.
+
+    Concurrent consumers count their unfinished requests in `in_flight`:
+    while any remain, one of them may still be requeued, so at the end of
+    the walk the generator yields None ("nothing yet, ask again") until
+    they settle, instead of ending or starting a pass that re-hands them out.
+    """
+
+    def __init__(self, low, high, is_done, state_file=None, seed=None, save_every=100, lookback=64,
+                 retry_passes=1):
+        self.low = low
+        self.high = high
+        self.n = high - low + 1
+        self.is_done = is_done
+        self.state_file = state_file
+        self.save_every = save_every
+        # On resume, re-check the last few IDs handed out: they may still have
+        # been in flight when the cursor was saved. Done ones are skipped for free.
+        self.lookback = lookback
+        self.retry_passes = retry_passes
+        self.cursor = 0
+        self.sweep = 0      # 0 for the first walk, then one more per retry pass
+        self.retry = deque()
+        self.in_flight = 0
+
+        state = self._load_state()
+        if state is not None:
+            seed = state["seed"]
+            self.cursor = state["cursor"]
+            self.sweep = state.get("sweep", 0)
+            self.retry.extend(state.get("retry", []))
+        elif seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+
+        rng = random.Random(seed)
+        self.a = rng.randrange(1, self.n) if self.n > 1 else 1
+        while math.gcd(self.a, self.n) != 1:
+            self.a = rng.randrange(1, self.n)
+        self.c = rng.randrange(self.n)
+
+        self.remaining = self._count_remaining()
+        self._since_save = 0
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        # A cursor is only meaningful for the range it was recorded on
+        if state.get("low") != self.low or state.get("high") != self.high:
+            return None
+        return state
+
+    def id_at(self, index):
+        return self.low + (self.a * index + self.c) % self.n
+
+    def _count_remaining(self):
+        """IDs from the cursor onwards that still need probing, plus those waiting to be retried."""
+        return len(self.retry) + sum(1 for index in range(self.cursor, self.n) if not self.is_done(self.id_at(index)))
+
+    def requeue(self, manga_id):
+        """Hands `manga_id` out again before the walk continues (e.g. after a 429)."""
+        self.retry.append(manga_id)
+        self.remaining += 1
+
+    def __iter__(self):
+        passes_left = self.retry_passes
+        while True:
+            while self.cursor < self.n or self.retry:
+                if self.retry:
+                    manga_id = self.retry.popleft()
+                    self.remaining -= 1
+                    if not self.is_done(manga_id):
+                        yield manga_id
+                    continue
+
+                manga_id = self.id_at(self.cursor)
+                self.cursor += 1
+                if self.is_done(manga_id):
+                    continue
+
+                self.remaining -= 1
+                self._since_save += 1
+                if self._since_save >= self.save_every:
+                    self.save()
+                yield manga_id
+
+            if self.in_flight:
+                yield None
+                continue
+
+            # Walk through: start a retry pass if anything is still unresolved.
+            # IDs handed out last come last in the new pass, by when they are settled.
+            if passes_left <= 0:
+                break
+            self.cursor = 0
+            self.remaining = self._count_remaining()
+            if not self.remaining:
+                self.cursor = self.n
+                break
+            passes_left -= 1
+            self.sweep += 1
+            self.save()
+        self.save()
+
+    def save(self):
+        self._since_save = 0
+        if not self.state_file:
+            return
+        state = {
+            "low": self.low,
+            "high": self.high,
+            "seed": self.seed,
+            "sweep": self.sweep,
+            # A finished walk needs no lookback: what was in flight is left to the retry pass
+            "cursor": self.n if self.cursor >= self.n else max(0, self.cursor - self.lookback),
+            "retry": list(self.retry),
+        }
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def progress(self):
+        """Fraction of the range the cursor has walked through."""
+        return self.cursor / self.n
@@ -0,0 +1,226 @@
+import mmap
+import os
+import struct
+import sys
+from collections import Counter
+
+# --- ID STATES (2 bits per ID) ---
+UNKNOWN = 0   # Never probed (or probe result discarded)
+GOOD = 1      # 200 - record captured
+BAD = 2       # 404 - blacklisted
+ERROR = 3     # Probe failed (timeout, 5xx...) - safe to retry
+
+STATE_NAMES = {UNKNOWN: "unknown", GOOD: "good", BAD: "bad", ERROR: "error"}
+
+MAGIC = b"MIDSTORE"
+VERSION = 1
+HEADER = struct.Struct("<8sII")   # magic, version, high id
+
+
+class IdStore:
+    """
+    Memory-mapped 2-bit-per-ID status array covering IDs 1..high.
+
+    Replaces the good/bad ID text files: opening it is a single mmap (no
+    parsing), lookups and updates touch one byte in place, and the OS writes
+    dirty pages back - call flush() to force them to disk.
+    """
+
+    def __init__(self, path, high):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, high))
+                f.truncate(HEADER.size + self._data_size(high))
+
+        self._file = open(path, "r+b")
+        magic, version, stored_high = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            self._file.close()
+            raise ValueError(f"{path} is not an ID state file")
+
+        # Growing the range keeps existing states; IDs above the old high start UNKNOWN
+        if high > stored_high:
+            self._file.truncate(HEADER.size + self._data_size(high))
+            self._file.seek(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, high))
+            self._file.flush()
+            stored_high = high
+
+        self.high = stored_high
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._counts = self._count_states()
+
+    @staticmethod
+    def _data_size(high):
+        return (high + 1 + 3) // 4
+
+    def _count_states(self):
+        """Counts IDs per state from a histogram of the packed bytes."""
+        histogram = Counter(memoryview(self._mm)[HEADER.size:])
+        counts = {GOOD: 0, BAD: 0, ERROR: 0}
+        for byte, n in histogram.items():
+            for slot in range(4):
+                state = (byte >> (slot * 2)) & 3
+                if state != UNKNOWN:
+                    counts[state] += n
+        counts[UNKNOWN] = self.high - counts[GOOD] - counts[BAD] - counts[ERROR]
+        return counts
+
+    def _locate(self, manga_id):
+        if not 1 <= manga_id <= self.high:
+            raise ValueError(f"ID {manga_id} outside 1..{self.high}")
+        return HEADER.size + (manga_id >> 2), (manga_id & 3) * 2
+
+    def get(self, manga_id):
+        offset, shift = self._locate(manga_id)
+        return (self._mm[offset] >> shift) & 3
+
+    def set(self, manga_id, state):
+        offset, shift = self._locate(manga_id)
+        byte = self._mm[offset]
+        old = (byte >> shift) & 3
+        if old != state:
+            self._mm[offset] = (byte & ~(3 << shift) & 0xFF) | (state << shift)
+            self._counts[old] -= 1
+            self._counts[state] += 1
+
+    def is_done(self, manga_id):
+        """True for IDs that never need probing again (good or blacklisted)."""
+        return self.get(manga_id) in (GOOD, BAD)
+
+    def count(self, state):
+        return self._counts[state]
+
+    def ids_with(self, state, low=1, high=None):
+        """Yields every ID in low..high currently in `state`."""
+        high = self.high if high is None else min(high, self.high)
+        for manga_id in range(max(low, 1), high + 1):
+            if self.get(manga_id) == state:
+                yield manga_id
+
+    def block_counts(self, block_size):
+        """
+        Per-state ID counts for consecutive blocks [0, size), [size, 2*size)...
+        (ID 0 and the padding past `high` are left out).
+
+        Counted from histograms of the packed bytes, so `block_size` must be a
+        multiple of 4.
+
+        Returns:
+            list: one {state: count} dict per block
+        """
+        if block_size % 4:
+            raise ValueError("block_size must be a multiple of 4")
+        data = memoryview(self._mm)[HEADER.size:]
+        step = block_size // 4
+        blocks = []
+        for start in range(0, len(data), step):
+            counts = {UNKNOWN: 0, GOOD: 0, BAD: 0, ERROR: 0}
+            for byte, n in Counter(data[start:start + step]).items():
+                for slot in range(4):
+                    counts[(byte >> (slot * 2)) & 3] += n
+            blocks.append(counts)
+        slots = len(data) * 4
+        data.release()
+
+        blocks[0][UNKNOWN] -= 1
+        blocks[-1][UNKNOWN] -= slots - (self.high + 1)
+        return blocks
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_ids(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, "r") as f:
+        return [int(line.strip()) for line in f if line.strip().isdigit()]
+
+
+def import_text_ledgers(store, good_file, bad_file):
+    """
+    Loads the legacy good/bad ID text files into the store.
+    A GOOD entry wins if an ID appears in both files.
+
+    Returns:
+        tuple: (good_imported, bad_imported, skipped_out_of_range)
+    """
+    good_count = bad_count = skipped = 0
+    for state, filename in ((BAD, bad_file), (GOOD, good_file)):
+        for manga_id in _read_ids(filename):
+            if not 1 <= manga_id <= store.high:
+                skipped += 1
+                continue
+            store.set(manga_id, state)
+            if state == GOOD:
+                good_count += 1
+            else:
+                bad_count += 1
+    store.flush()
+    return good_count, bad_count, skipped
+
+
+def export_text_ledger(store, state, filename):
+    """Writes every ID in `state` to a text file, one per line."""
+    with open(filename, "w") as f:
+        for manga_id in store.ids_with(state):
+            f.write(f"{manga_id}\n")
+
+
+def open_store(path, high, good_file=None, bad_file=None):
+    """
+    Opens the state file, importing the legacy text ledgers the first time
+    so existing progress carries over.
+    """
+    is_new = not os.path.exists(path)
+    store = IdStore(path, high)
+    if is_new and good_file and bad_file:
+        good_count, bad_count, skipped = import_text_ledgers(store, good_file, bad_file)
+        print(f"Imported ledgers -> {path}. Good: {good_count} | Bad: {bad_count} | Out of range: {skipped}")
+    return store
+
+
+if __name__ == "__main__":
+    # Usage:
+    #   python id_store.py import STATE_FILE HIGH GOOD_FILE BAD_FILE
+    #   python id_store.py export STATE_FILE good|bad|error OUT_FILE
+    #   python id_store.py stats  STATE_FILE
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if command != "import" and not os.path.exists(sys.argv[2]):
+        print(f"Error: Could not find {sys.argv[2]}")
+        sys.exit(1)
+
+    if command == "import":
+        state_file, high, good_file, bad_file = sys.argv[2], int(sys.argv[3]), sys.argv[4], sys.argv[5]
+        with IdStore(state_file, high) as store:
+            good_count, bad_count, skipped = import_text_ledgers(store, good_file, bad_file)
+            print(f"Imported. Good: {good_count} | Bad: {bad_count} | Out of range: {skipped}")
+
+    elif command == "export":
+        state_file, state_name, out_file = sys.argv[2], sys.argv[3], sys.argv[4]
+        state = {name: state for state, name in STATE_NAMES.items()}[state_name]
+        with IdStore(state_file, 0) as store:
+            export_text_ledger(store, state, out_file)
+            print(f"Exported {store.count(state)} {state_name} IDs to {out_file}")
+
+    else:
+        state_file = sys.argv[2]
+        with IdStore(state_file, 0) as store:
+            print(f"IDs 1..{store.high}")
+            for state, name in STATE_NAMES.items():
+                print(f"   {name:8s}: {store.count(state)}")
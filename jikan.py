@@ -0,0 +1,58 @@
+"""Shared Jikan API constants and record extraction used by the fetch scripts."""
+
+import time
+
+API_BASE = "https://api.jikan.moe/v4"
+
+# Jikan's published quotas: 3 requests per second and 60 requests per minute
+PER_SECOND_LIMIT = 3
+PER_MINUTE_LIMIT = 60
+
+
+def manga_url(manga_id):
+    """URL of the full payload for one manga ID."""
+    return f"{API_BASE}/manga/{manga_id}/full"
+
+
+def _names(items):
+    return [x["name"] for x in (items or [])]
+
+
+# Every field a row can carry, computed from the /full payload's "data" object.
+# The scrapers keep DEFAULT_FIELDS; payload_archive.py can re-extract any
+# other projection from archived payloads without re-fetching.
+FIELDS = {
+    "id": lambda data: data.get("mal_id"),
+    "title": lambda data: data.get("title_english") or data.get("title"),
+    "score": lambda data: data.get("score"),
+    "members": lambda data: data.get("members"),
+    "demographic": lambda data: (data.get("demographics") or [{"name": "Unknown"}])[0]["name"],
+    "tags": lambda data: _names(data.get("genres", []) + data.get("themes", [])),
+    "title_japanese": lambda data: data.get("title_japanese"),
+    "type": lambda data: data.get("type"),
+    "status": lambda data: data.get("status"),
+    "chapters": lambda data: data.get("chapters"),
+    "volumes": lambda data: data.get("volumes"),
+    "rank": lambda data: data.get("rank"),
+    "popularity": lambda data: data.get("popularity"),
+    "favorites": lambda data: data.get("favorites"),
+    "scored_by": lambda data: data.get("scored_by"),
+    "published_from": lambda data: (data.get("published") or {}).get("from"),
+    "published_to": lambda data: (data.get("published") or {}).get("to"),
+    "authors": lambda data: _names(data.get("authors")),
+    "serializations": lambda data: _names(data.get("serializations")),
+    "genres": lambda data: _names(data.get("genres")),
+    "themes": lambda data: _names(data.get("themes")),
+}
+
+DEFAULT_FIELDS = ("id", "title", "score", "members", "demographic", "tags")
+
+
+def extract_record(data, fetched_at=None, fields=DEFAULT_FIELDS):
+    """
+    Reduces a Jikan manga payload to the row we keep in the JSONL files.
+    `fetched_at` (unix seconds, default now) drives staleness-based refresh.
+    """
+    record = {name: FIELDS[name](data) for name in fields}
+    record["fetched_at"] = int(time.time() if fetched_at is None else fetched_at)
+    return record
@@ -1,47 +1,403 @@
-import pandas as pd
+import argparse
+import hashlib
 import json
+import os
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from jsonl_loader import iter_jsonl_ranges
 
 # 1. SETUP: Input and Output filenames
-INPUT_FILE = "manga.jsonl" # Or "manga.json" if you used the list format
-OUTPUT_FILE = "manga_dataset.csv"
+INPUT_FILE = "manga.jsonl"
+OUTPUT_FILE = "manga_dataset.parquet"   # .parquet, .arrow or .csv
+CHUNK_ROWS = 50000                      # Rows converted and written at a time (one row group each)
+WORKERS = None                          # Parser processes (None: one per core)
+
+# --- INCREMENTAL MODE ---
+# The output is a directory of Parquet parts plus a watermark recording how
+# far into which input file the parts go
+WATERMARK_FILE = "_watermark.json"
+MAX_PARTS = 32                          # More parts than this are compacted into one
+
+# Column types for the fields the scrapers write. Any other field (see
+# payload_archive.py's re-extraction) gets the type inferred from the first chunk.
+BASE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("title", pa.string()),
+    ("score", pa.float64()),
+    ("members", pa.int64()),
+    ("demographic", pa.string()),
+    ("tags", pa.list_(pa.string())),   # Native list column: no "Action, Comedy" strings
+    ("fetched_at", pa.int64()),
+])
+
+
+def _to_int(value):
+    try:
+        return None if value is None else int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def clean_record(record):
+    """
+    The cleaning the old DataFrame pass did, one row at a time:
+    numeric score (NaN if not a number), "Unknown" demographic -> null, integer id.
+    """
+    record = dict(record)
+    record["id"] = _to_int(record.get("id"))
+    record["score"] = _to_float(record.get("score"))
+    record["members"] = _to_int(record.get("members"))
+    record["fetched_at"] = _to_int(record.get("fetched_at"))
+    if record.get("demographic") == "Unknown":
+        record["demographic"] = None
+    tags = record.get("tags")
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    record["tags"] = tags if isinstance(tags, list) else None
+    return record
+
+
+def iter_column_chunks_at(filename, chunk_rows=CHUNK_ROWS, start=0, workers=WORKERS, complete_lines=False):
+    """
+    Yields (columns, end_offset): cleaned rows as a JsonlColumns, at least
+    `chunk_rows` at a time (whole parsed ranges), from byte `start`, with
+    the offset just past the chunk's last line. Lines are parsed by
+    jsonl_loader's process pool; blank and unparseable lines are skipped.
+    With `complete_lines` (incremental runs) a torn last line (no newline
+    yet, e.g. mid-append) is left for the next run.
+    """
+    pending = None
+    for part in iter_jsonl_ranges(filename, start, transform=clean_record, workers=workers,
+                                  complete_lines=complete_lines):
+        pending = part if pending is None else pending.extend(part)
+        if pending.rows >= chunk_rows:
+            yield pending, pending.end
+            pending = None
+    if pending is not None:
+        yield pending, pending.end
+
+
+def iter_record_chunks(filename, chunk_rows=CHUNK_ROWS, start=0):
+    """Lists of cleaned records, at least `chunk_rows` at a time, from byte `start`."""
+    for columns, _ in iter_column_chunks_at(filename, chunk_rows, start):
+        if columns.rows:
+            yield list(columns.records())
+
+
+def _extend_schema(schema, inferred):
+    for field in inferred:
+        schema = schema.append(field.with_type(pa.string()) if pa.types.is_null(field.type) else field)
+    return schema
+
+
+def build_schema(sample):
+    """BASE_SCHEMA plus any extra fields found in `sample`, typed from their values."""
+    extra = [name for name in dict.fromkeys(key for record in sample for key in record)
+             if name not in BASE_SCHEMA.names]
+    if not extra:
+        return BASE_SCHEMA
+    return _extend_schema(BASE_SCHEMA, pa.Table.from_pylist([{name: record.get(name) for name in extra}
+                                                             for record in sample]).schema)
+
+
+def build_column_schema(columns):
+    """build_schema for a JsonlColumns chunk."""
+    extra = [name for name in columns.columns if name not in BASE_SCHEMA.names]
+    if not extra:
+        return BASE_SCHEMA
+    return _extend_schema(BASE_SCHEMA, pa.Table.from_pydict({name: columns.columns[name] for name in extra}).schema)
+
+
+def to_table(records, schema):
+    """One chunk as an Arrow table, sorted by id. Fields outside `schema` are dropped."""
+    return pa.Table.from_pylist(records, schema=schema).sort_by("id")
+
+
+def columns_to_table(columns, schema):
+    """to_table for a JsonlColumns chunk: columns go to Arrow as they are, no per-row dicts."""
+    return pa.Table.from_pydict({name: columns.column(name) for name in schema.names}, schema=schema).sort_by("id")
+
+
+# --- OUTPUT FORMATS ---
+# Each writes to a temporary file that replaces the output only when closed,
+# so a failed run never leaves a half-written dataset behind.
+
+class ParquetSink:
+    def __init__(self, filename, schema, compression="zstd"):
+        self.filename = filename
+        self.tmp_file = filename + ".tmp"
+        self._writer = pq.ParquetWriter(self.tmp_file, schema, compression=compression)
+
+    def write(self, table):
+        self._writer.write_table(table, row_group_size=table.num_rows)
+
+    def close(self):
+        self._writer.close()
+        os.replace(self.tmp_file, self.filename)
+
+
+class ArrowSink:
+    def __init__(self, filename, schema):
+        self.filename = filename
+        self.tmp_file = filename + ".tmp"
+        self._file = pa.OSFile(self.tmp_file, "wb")
+        self._writer = ipc.new_file(self._file, schema)
+
+    def write(self, table):
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+        self._file.close()
+        os.replace(self.tmp_file, self.filename)
+
+
+class CsvSink:
+    """The old CSV layout: tags joined into one "Action, Comedy" string."""
+
+    def __init__(self, filename, schema):
+        self.filename = filename
+        self.tmp_file = filename + ".tmp"
+        self._header = True
+
+    def write(self, table):
+        df = table.to_pandas()
+        df["tags"] = [", ".join(tags) if tags is not None else None for tags in df["tags"]]
+        df["id"] = df["id"].astype("Int64")
+        df.to_csv(self.tmp_file, mode="w" if self._header else "a", header=self._header, index=False, encoding="utf-8")
+        self._header = False
+
+    def close(self):
+        if self._header:
+            pd.DataFrame(columns=BASE_SCHEMA.names).to_csv(self.tmp_file, index=False, encoding="utf-8")
+        os.replace(self.tmp_file, self.filename)
+
+
+SINKS = {
+    ".parquet": ParquetSink,
+    ".arrow": ArrowSink,
+    ".csv": CsvSink,
+}
+
+
+def format_of(filename, fmt=None):
+    ext = "." + fmt if fmt else os.path.splitext(filename)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"Unknown output format {ext!r} (use {', '.join(SINKS)})")
+    return ext
+
+
+def convert(input_file, output_file, fmt=None, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the JSONL into `output_file` one chunk at a time, so peak memory
+    is one chunk however large the input grows. Rows are sorted by id within
+    each chunk (row group); merge_csvs.py produces a fully sorted dataset.
+
+    Returns:
+        tuple: (rows_written, first_chunk_table or None)
+    """
+    sink_class = SINKS[format_of(output_file, fmt)]
+    sink = None
+    rows = 0
+    preview = None
+    for columns, _ in iter_column_chunks_at(input_file, chunk_rows):
+        if not columns.rows:
+            continue
+        if sink is None:
+            schema = build_column_schema(columns)
+            sink = sink_class(output_file, schema)
+        table = columns_to_table(columns, schema)
+        sink.write(table)
+        rows += table.num_rows
+        if preview is None:
+            preview = table.slice(0, 5)
+    if sink is None:
+        sink = sink_class(output_file, BASE_SCHEMA)
+    sink.close()
+    return rows, preview
+
+
+# --- INCREMENTAL CONVERSION ---
+def file_identity(filename, offset):
+    """
+    What the watermark pins: the file (device + inode) and hashes of its
+    first 4 KB and of the 4 KB before `offset` (both within the first `offset` bytes). An atomic rewrite (refresh,
+    merge, re-extraction) gets a new inode; an in-place edit changes a hash.
+    """
+    st = os.stat(filename)
+    with open(filename, "rb") as f:
+        head = hashlib.sha256(f.read(min(offset, 4096))).hexdigest()
+        f.seek(max(0, offset - 4096))
+        tail = hashlib.sha256(f.read(min(offset, 4096))).hexdigest()
+    return {"path": os.path.abspath(filename), "device": st.st_dev, "inode": st.st_ino,
+            "offset": offset, "head": head, "tail": tail}
+
+
+def load_watermark(dataset_dir):
+    path = os.path.join(dataset_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_watermark(dataset_dir, mark):
+    path = os.path.join(dataset_dir, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(mark, f)
+    os.replace(path + ".tmp", path)
+
+
+def watermark_matches(mark, filename):
+    """True if `filename` is still the file the watermark was taken on, grown or not."""
+    if mark is None or mark["path"] != os.path.abspath(filename) or not os.path.exists(filename):
+        return False
+    if os.path.getsize(filename) < mark["offset"]:
+        return False
+    return file_identity(filename, mark["offset"]) == mark
+
+
+def list_parts(dataset_dir):
+    return sorted(os.path.join(dataset_dir, name) for name in os.listdir(dataset_dir)
+                  if name.startswith("part-") and name.endswith(".parquet"))
+
+
+def _write_part(path, table):
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def _upsert_chunk(dataset_dir, columns, schema, part_ids):
+    """
+    Writes one chunk as a new part. Rows of older parts with the same ids
+    are removed first (their part is rewritten without them), so every id
+    lives in exactly one part. A later line for an id beats an earlier one.
+    """
+    table = pa.Table.from_pydict({name: columns.column(name) for name in schema.names}, schema=schema)
+    table = table.filter(pc.is_valid(table.column("id")))
+    ids = table.column("id").to_numpy()
+    _, last_from_end = np.unique(ids[::-1], return_index=True)
+    table = table.take(np.sort(len(ids) - 1 - last_from_end)).sort_by("id")
+    new_ids = table.column("id").to_numpy()
+
+    replaced = 0
+    for part, ids in list(part_ids.items()):
+        stale = np.isin(ids, new_ids)
+        if not stale.any():
+            continue
+        replaced += int(stale.sum())
+        old = pq.read_table(part)
+        kept = old.filter(pc.invert(pc.is_in(old.column("id"), value_set=pa.array(new_ids))))
+        if kept.num_rows:
+            _write_part(part, kept)
+            part_ids[part] = ids[~stale]
+        else:
+            os.remove(part)
+            del part_ids[part]
+
+    numbers = [int(os.path.basename(part)[5:10]) for part in part_ids]
+    part = os.path.join(dataset_dir, f"part-{max(numbers, default=-1) + 1:05d}.parquet")
+    _write_part(part, table)
+    part_ids[part] = new_ids
+    return table.num_rows, replaced
+
+
+def compact(dataset_dir, schema):
+    """Streams every part, row group by row group, into one new part."""
+    parts = list_parts(dataset_dir)
+    target = os.path.join(dataset_dir, "part-00000.parquet")
+    tmp_file = target + ".compact"
+    with pq.ParquetWriter(tmp_file, schema, compression="zstd") as writer:
+        for part in parts:
+            source = pq.ParquetFile(part)
+            for i in range(source.num_row_groups):
+                writer.write_table(source.read_row_group(i).cast(schema))
+    for part in parts:
+        os.remove(part)
+    os.replace(tmp_file, target)
+
 
-print("Reading JSON data...")
+def convert_incremental(input_file, dataset_dir, chunk_rows=CHUNK_ROWS):
+    """
+    Brings a Parquet part directory up to date with the JSONL: only the bytes
+    after the watermark are parsed. If the input is no longer the file the
+    watermark was taken on (rewritten, truncated), the parts are rebuilt.
 
-# 2. LOAD DATA
-# If you used the line-by-line method (Recommended):
-data = []
-try:
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.strip(): # Skip empty lines
-                data.append(json.loads(line))
-except FileNotFoundError:
-    print(f"Error: Could not find {INPUT_FILE}")
-    exit()
+    Returns:
+        tuple: (rows_written, rows_replaced, rebuilt)
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    mark = load_watermark(dataset_dir)
+    parts = list_parts(dataset_dir)
+    rebuilt = not parts or not watermark_matches(mark, input_file)
+    if rebuilt:
+        for part in parts:
+            os.remove(part)
+        start, schema, part_ids = 0, None, {}
+    else:
+        start = mark["offset"]
+        schema = pq.read_schema(parts[0])
+        part_ids = {part: pq.read_table(part, columns=["id"]).column("id").to_numpy() for part in parts}
 
-# 3. CREATE DATAFRAME
-df = pd.DataFrame(data)
+    written = replaced = 0
+    offset = start
+    for columns, offset in iter_column_chunks_at(input_file, chunk_rows, start, complete_lines=True):
+        if columns.rows:
+            if schema is None:
+                schema = build_column_schema(columns)
+            rows, stale = _upsert_chunk(dataset_dir, columns, schema, part_ids)
+            written += rows
+            replaced += stale
+        # Saved after every chunk: a crash re-reads at most one chunk, and the
+        # upsert makes re-reading it harmless
+        save_watermark(dataset_dir, file_identity(input_file, offset))
 
-# 4. CLEANING (The Crucial Step)
-# You have a list ['Action', 'Comedy'] in the 'tags' column.
-# CSVs hate lists. We must convert them to strings "Action, Comedy".
-print("Processing tags...")
-df['tags'] = df['tags'].apply(lambda x: ", ".join(x) if isinstance(x, list) else x)
+    if len(part_ids) > MAX_PARTS:
+        compact(dataset_dir, schema)
+    if offset == start:
+        save_watermark(dataset_dir, file_identity(input_file, offset))
+    return written, replaced, rebuilt
 
-# 5. HANDLE MISSING VALUES
-# Replace 'None' in scores with NaN so Pandas can do math later
-df['score'] = pd.to_numeric(df['score'], errors='coerce') 
 
-df['demographic']=df["demographic"].replace(["Unknown"],np.nan)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a scraped JSONL file to Parquet, Arrow IPC or CSV.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE)
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE)
+    parser.add_argument("--format", choices=[ext.lstrip(".") for ext in SINKS],
+                        help="output format (default: from the output file's extension)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--incremental", action="store_true",
+                        help="OUTPUT is a directory of Parquet parts; only the JSONL's new tail is converted")
+    args = parser.parse_args()
 
-df["id"]=df["id"].round().astype("Int64")
+    if not os.path.exists(args.input):
+        print(f"Error: Could not find {args.input}")
+        exit()
 
-df.sort_values("id",inplace=True)
+    if args.incremental:
+        output = os.path.splitext(args.output)[0] if args.output == OUTPUT_FILE else args.output
+        written, replaced, rebuilt = convert_incremental(args.input, output, args.chunk_rows)
+        action = "Rebuilt" if rebuilt else "Updated"
+        print(f"{action} {output}: {written} rows written, {replaced} older copies replaced")
+        exit()
 
-# 6. SAVE TO CSV
-df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
+    print(f"Converting {args.input} -> {args.output} ({args.chunk_rows} rows per chunk)...")
+    rows, preview = convert(args.input, args.output, args.format, args.chunk_rows)
 
-print(f"Success! Converted {len(df)} rows to {OUTPUT_FILE}")
-print("\nFirst 5 rows:")
-print(df.head())
\ No newline at end of file
+    print(f"Success! Converted {rows} rows to {args.output}")
+    if preview is not None:
+        print("\nFirst 5 rows:")
+        print(preview.to_pandas())
@@ -0,0 +1,199 @@
+"""
+Parallel JSONL parsing for the scraped dumps.
+
+The file is cut into byte ranges that start and end on line boundaries and
+a process pool parses the ranges side by side, with orjson when it is
+installed and the standard json module otherwise. Each range comes back as
+columns (field -> list of values); blank lines are skipped and lines that
+don't parse to an object are counted, not fatal.
+
+    python jsonl_loader.py manga_data_full_1.jsonl --fields id score
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+    _loads = orjson.loads
+    DECODER = "orjson"
+except ImportError:
+    _loads = json.loads
+    DECODER = "json"
+
+RANGE_BYTES = 8 * 1024 * 1024   # Bytes per parsed range (one task for the pool)
+SCAN_BYTES = 64 * 1024          # Read size when looking for the last complete line
+
+
+class JsonlColumns:
+    """
+    Parsed rows as columns: `columns[field][i]` is row i's value (None where
+    the row lacks the field). `end` is the byte offset just past the last
+    line parsed, `malformed` the number of lines that weren't a JSON object.
+    """
+
+    def __init__(self, columns=None, rows=0, malformed=0, end=0):
+        self.columns = columns if columns is not None else {}
+        self.rows = rows
+        self.malformed = malformed
+        self.end = end
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, field):
+        return self.columns.get(field, [None] * self.rows)
+
+    def extend(self, other):
+        """Appends `other`'s rows (the range right after this one)."""
+        for field in other.columns:
+            if field not in self.columns:
+                self.columns[field] = [None] * self.rows
+        for field, values in self.columns.items():
+            values.extend(other.column(field))
+        self.rows += other.rows
+        self.malformed += other.malformed
+        self.end = max(self.end, other.end)
+        return self
+
+    def records(self):
+        """The rows back as dicts."""
+        fields = list(self.columns)
+        for row in zip(*(self.columns[field] for field in fields)):
+            yield dict(zip(fields, row))
+
+
+def _complete_end(f, start, size):
+    """Offset just past the last newline at or after `start` (`start` if there is none)."""
+    pos = size
+    while pos > start:
+        read_from = max(start, pos - SCAN_BYTES)
+        f.seek(read_from)
+        newline = f.read(pos - read_from).rfind(b"\n")
+        if newline >= 0:
+            return read_from + newline + 1
+        pos = read_from
+    return start
+
+
+def split_ranges(filename, start=0, range_bytes=RANGE_BYTES, complete_lines=False):
+    """
+    (start, end) byte ranges covering every line from `start` on, each
+    ending just past a newline (the last one at the end of the file).
+
+    With `complete_lines`, for incremental reads of a file that is still
+    being appended to, a last line without its newline is left out, so it
+    is read whole on a later run. Otherwise it is parsed like any other
+    (and counted as malformed if it was torn).
+    """
+    ranges = []
+    with open(filename, "rb") as f:
+        size = os.path.getsize(filename)
+        end_of_lines = _complete_end(f, start, size) if complete_lines else size
+        pos = start
+        while pos < end_of_lines:
+            cut = pos + range_bytes
+            if cut >= end_of_lines:
+                cut = end_of_lines
+            else:
+                f.seek(cut - 1)
+                f.readline()
+                cut = f.tell()
+            ranges.append((pos, cut))
+            pos = cut
+    return ranges
+
+
+def _parse_range(task):
+    """Runs in a pool worker: one byte range -> JsonlColumns."""
+    filename, start, end, fields, transform = task
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    columns = {field: [] for field in fields} if fields is not None else {}
+    rows = malformed = 0
+    for line in data.split(b"\n"):
+        if not line.strip():
+            continue
+        try:
+            record = _loads(line)
+        except ValueError:   # json.JSONDecodeError and orjson.JSONDecodeError both are
+            malformed += 1
+            continue
+        if not isinstance(record, dict):
+            malformed += 1
+            continue
+        if transform is not None:
+            record = transform(record)
+
+        if fields is not None:
+            for field in fields:
+                columns[field].append(record.get(field))
+        else:
+            for field, value in record.items():
+                values = columns.get(field)
+                if values is None:
+                    values = columns[field] = [None] * rows
+                values.append(value)
+            if len(record) < len(columns):
+                for values in columns.values():
+                    if len(values) == rows:
+                        values.append(None)
+        rows += 1
+    return JsonlColumns(columns, rows, malformed, end)
+
+
+def iter_jsonl_ranges(filename, start=0, fields=None, transform=None, workers=None, range_bytes=RANGE_BYTES,
+                      complete_lines=False):
+    """
+    Yields a JsonlColumns per byte range, in file order, from byte `start`.
+
+    At most two ranges per worker are in flight, so memory stays bounded
+    however large the file is. `transform` (a module-level function, so it
+    can be pickled) runs on every record in the worker; `fields`, if given,
+    limits the columns kept. A file that fits in one range is parsed in
+    this process. `complete_lines` is as in split_ranges.
+    """
+    tasks = [(filename, range_start, range_end, fields, transform)
+             for range_start, range_end in split_ranges(filename, start, range_bytes, complete_lines)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield _parse_range(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_parse_range, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_jsonl(filename, fields=None, transform=None, workers=None, start=0):
+    """The whole file (from byte `start`) as one JsonlColumns."""
+    result = JsonlColumns({field: [] for field in fields} if fields is not None else {}, end=start)
+    for part in iter_jsonl_ranges(filename, start, fields, transform, workers):
+        result.extend(part)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a JSONL file in parallel and report throughput.")
+    parser.add_argument("input")
+    parser.add_argument("--fields", nargs="+", help="only keep these fields")
+    parser.add_argument("--workers", type=int, help="pool size (default: one per core)")
+    args = parser.parse_args()
+
+    started = time.time()
+    result = load_jsonl(args.input, args.fields, workers=args.workers)
+    elapsed = time.time() - started
+    size = os.path.getsize(args.input)
+    print(f"{result.rows} rows, {len(result.columns)} columns, {result.malformed} malformed lines "
+          f"in {elapsed:.2f}s ({size / 1e6 / max(elapsed, 1e-9):.0f} MB/s, decoder: {DECODER})")
@@ -0,0 +1,173 @@
+"""
+Walks Jikan's mal_id-ordered listing, 25 titles per request, into the
+same dataset and ledger as the ID prober.
+
+    python listing_crawler.py                    # the linux preset's files
+    python listing_crawler.py --preset fast --set transport=curl_cffi
+
+Files, transport, ID range and pacing come from manga_scraper's settings
+(preset, then --config, then --set), so the crawl writes where the prober
+of that preset does and stays under the same rate ceiling.
+"""
+import argparse
+import json
+import os
+
+from jikan import API_BASE, extract_record
+from rate_limiter import RateLimiter, AimdController
+from id_store import open_store, GOOD, BAD
+from batch_writer import LedgerWriter
+from file_lock import FileLock, LockHeld
+from manga_scraper import PRESETS, TRANSPORTS, load_config, parse_setting
+
+PAGE_SIZE = 25                   # Jikan's maximum page size
+MAX_CONSICUTIVE_FALIURE=50       # Default for the crawl; max_consecutive_failures overrides it
+
+
+def listing_url(page):
+    return f"{API_BASE}/manga?order_by=mal_id&sort=asc&limit={PAGE_SIZE}&page={page}"
+
+
+def load_crawl_state(filename):
+    if os.path.exists(filename):
+        with open(filename, "r") as f:
+            return json.load(f)
+    return {"page": 0, "last_id": 0}
+
+
+def save_crawl_state(filename, state):
+    tmp_file = filename + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, filename)
+
+
+def apply_page(items, last_id, store, writer, high, contiguous=True):
+    """
+    Writes the page's records and marks the ID range it covers.
+
+    The listing is ordered by mal_id, so an ID between two listed ones that
+    is not on the page does not exist: it is blacklisted exactly as a 404
+    probe would. With `contiguous` (the previous page was fetched right
+    before this one) that also holds between the previous page's last ID
+    and this page's first. Otherwise, on the first page after a resume, the
+    listing may have shifted since the last run and moved a real ID across
+    that boundary, so the IDs there are left unknown for the ID prober.
+
+    Returns:
+        tuple: (new_last_id, captured, blacklisted)
+    """
+    captured = blacklisted = 0
+    listed = {}
+    for data in items:
+        manga_id = data.get("mal_id")
+        if manga_id and manga_id <= high:
+            listed[manga_id] = data
+    if not listed:
+        return last_id, 0, 0
+
+    for manga_id in sorted(listed):
+        # "Never Touch Again": IDs already captured keep their existing row
+        if store.get(manga_id) != GOOD:
+            writer.add_record(manga_id, extract_record(listed[manga_id]))
+            captured += 1
+
+    page_last = max(listed)
+    floor = last_id if contiguous else max(last_id, min(listed) - 1)
+    for manga_id in range(floor + 1, page_last + 1):
+        state = store.get(manga_id)
+        if manga_id not in listed and state != BAD and state != GOOD:
+            writer.mark(manga_id, BAD)
+            blacklisted += 1
+    return max(last_id, page_last), captured, blacklisted
+
+
+def crawl(transport, store, writer, limiter, controller, state_file, max_failures=MAX_CONSICUTIVE_FALIURE):
+    state = load_crawl_state(state_file)
+    page = state["page"] + 1
+    consecutive_errors = 0
+    total_captured = 0
+    contiguous = False   # Nothing fetched yet this session: don't trust the gap before the first page
+
+    print(f"Resuming listing crawl at page {page} (covered IDs 1..{state['last_id']})")
+
+    while consecutive_errors <= max_failures:
+        controller.wait()
+        limiter.acquire()
+
+        try:
+            response = transport.get(listing_url(page))
+            backoff = controller.on_response(response.status_code, response.headers)
+
+            # --- CASE: RATE LIMIT (429) / SERVER ERROR (5xx) ---
+            if backoff is not None:
+                print(f"!! Rate Limit ({response.status_code}). Backing off {backoff:.1f}s -> {controller.rate:.2f} req/s")
+                continue
+
+            if response.status_code != 200:
+                print(f"xx Page {page}: HTTP {response.status_code}")
+                consecutive_errors += 1
+                continue
+
+            payload = response.json()
+            items = payload.get("data", [])
+            last_id, captured, blacklisted = apply_page(items, state["last_id"], store, writer, store.high, contiguous)
+            writer.commit()
+            contiguous = True
+
+            state = {"page": page, "last_id": last_id}
+            save_crawl_state(state_file, state)
+            total_captured += captured
+            consecutive_errors = 0
+            print(f"++ Page {page}: {captured} captured, {blacklisted} blacklisted, covered 1..{last_id} [{controller.rate:.2f} req/s]")
+
+            has_next = payload.get("pagination", {}).get("has_next_page", False)
+            past_ledger = any((data.get("mal_id") or 0) > store.high for data in items)
+            if not items or not has_next or past_ledger:
+                break
+            page += 1
+
+        except Exception as e:
+            print(f"Error: {e}")
+            controller.on_error()
+            consecutive_errors += 1
+
+    return total_captured
+
+
+def run(config, limiter=None):
+    """Crawls into config's dataset and ledger. Returns the number of new captures."""
+    # Same ledger and journal as the ID prober: only one of them may write at a time
+    with FileLock(config["state_file"] + ".lock"):
+        store = open_store(config["state_file"], config["high"], config["good_ids_file"], config["bad_ids_file"])
+        writer = LedgerWriter(config["data_file"], store, batch_size=config["batch_size"],
+                              flush_interval=config["flush_interval"], fsync=config["fsync"])
+        transport = TRANSPORTS[config["transport"]](config)
+        print(f"Memory Loaded. Blacklisted: {store.count(BAD)} | Completed: {store.count(GOOD)}")
+        try:
+            return crawl(transport, store, writer, limiter or RateLimiter(), AimdController(rate=config["start_rate"]),
+                         config["crawl_state_file"], config["max_consecutive_failures"])
+        finally:
+            writer.close()
+            store.close()
+            transport.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl the mal_id-ordered listing into the prober's dataset.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="linux")
+    parser.add_argument("--config", help="JSON file of settings (keys as in manga_scraper.DEFAULT_CONFIG)")
+    parser.add_argument("--set", dest="settings", action="append", type=parse_setting, default=[],
+                        metavar="KEY=VALUE", help="any other setting; repeatable")
+    args = parser.parse_args()
+
+    overrides = {"max_consecutive_failures": MAX_CONSICUTIVE_FALIURE}
+    overrides.update(args.settings)
+    config = load_config(args.preset, args.config, overrides)
+    try:
+        captured = run(config)
+    except LockHeld as e:
+        print(f"Scraper running ({e}); not crawling")
+        exit()
+
+    print(f"Job Done. Captured {captured} new manga.")
@@ -0,0 +1,483 @@
+"""
+One scraper for every machine: the probe loop that used to be copied into
+slower_fetch_manga.py, faster_fetch_manga.py and faster_scraper_for_linux.py.
+
+    python manga_scraper.py --preset linux
+    python manga_scraper.py --preset fast --target 2000
+    python manga_scraper.py --config my_run.json --set concurrency=5 --set log_level=all
+
+Settings are resolved in this order (later wins): DEFAULT_CONFIG, the preset,
+the JSON --config file, the command-line flags. `python manga_scraper.py
+--preset linux --show-config` prints the result without scraping.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from jikan import manga_url, extract_record
+from rate_limiter import RateLimiter, AimdController
+from id_store import open_store, GOOD, BAD, ERROR
+from id_scheduler import SweepScheduler
+from probe_planner import DensityScheduler
+from batch_writer import LedgerWriter
+from file_lock import FileLock
+from jsonl_loader import load_jsonl
+from response_cache import ResponseCache, CachingSession, AsyncCachingSession
+from scraper_metrics import ScraperMetrics, LOG_ALL, LOG_SAMPLED, LOG_QUIET
+
+script_dir=os.path.dirname(os.path.abspath(__file__))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+DEFAULT_CONFIG = {
+    # --- HTTP ---
+    "transport": "requests",      # "requests" or "curl_cffi"
+    "impersonate": "chrome",      # curl_cffi browser fingerprint
+    "pool_size": 10,              # Keep-alive connections held open per host
+    "timeout": 10,
+    "user_agent": USER_AGENT,
+    # --- FILES ---
+    "data_file": "manga_data.jsonl",     # The actual data
+    "state_file": "id_state.bin",        # Good/bad/error status of every ID
+    "good_ids_file": "good_ids.txt",     # Legacy whitelist, imported into state_file once
+    "bad_ids_file": "bad_ids.txt",       # Legacy blacklist, imported into state_file once
+    "cursor_file": "sweep_cursor.json",  # Where the shuffled sweep stopped
+    "cache_dir": "http_cache",           # Raw /full responses (unless archive_dir is set); null disables the cache
+    "cache_max_mb": 2048,                # Least recently fetched responses are dropped past this
+    "cache_expire_days": 30,             # Responses not fetched again for this long are dropped
+    "archive_dir": None,                 # zstd payload archive for re-extraction; null disables it
+    "seed_from_data": False,             # First run: whitelist the IDs already in data_file
+    "crawl_state_file": "crawl_state.json",  # listing_crawler.py: last finished listing page
+    # --- RANGE ---
+    "low": 1,
+    "high": 60000,
+    "target": 10000,                     # Stop after this many captures
+    "order": "shuffled",                 # "shuffled" sweep, or "density": high-yield ID blocks first
+    "block_size": 1000,                  # density: IDs per block (a multiple of 4)
+    "min_rate": 0.0,                     # density: skip blocks whose estimated hit rate is below this
+    "max_consecutive_failures": 10,
+    "max_misses": None,                  # Stop after this many requests in a row without a capture; null disables it
+    # --- WRITES ---
+    "batch_size": 50,
+    "flush_interval": 5.0,
+    "fsync": True,
+    # --- CONCURRENCY / PACING ---
+    "async": False,                      # Keep `concurrency` requests in flight
+    "concurrency": 3,
+    "start_rate": 1 / 1.5,               # AIMD starting rate (the old fixed 1.5s sleep)
+    # --- OBSERVABILITY ---
+    "log_level": LOG_ALL,                # "all", "sampled" or "quiet"
+    "log_every": 100,
+    "metrics_interval": 15.0,
+    "metrics_prom_file": None,
+    "metrics_json_file": None,
+}
+
+# The three old scripts, as settings
+PRESETS = {
+    # faster_scraper_for_linux.py
+    "linux": {
+        "transport": "curl_cffi",
+        "data_file": os.path.join(script_dir,"manga_data_full_1.jsonl"),
+        "state_file": os.path.join(script_dir,"id_state_1.bin"),
+        "good_ids_file": os.path.join(script_dir,"good_ids_1.txt"),
+        "bad_ids_file": os.path.join(script_dir,"bad_ids_1.txt"),
+        "cursor_file": os.path.join(script_dir,"sweep_cursor_1.json"),
+        "crawl_state_file": os.path.join(script_dir,"crawl_state_1.json"),
+        "cache_dir": os.path.join(script_dir,"http_cache_1"),
+        "archive_dir": os.path.join(script_dir,"raw_archive_1"),
+        "metrics_prom_file": os.path.join(script_dir,"scraper_1.prom"),
+        "metrics_json_file": os.path.join(script_dir,"scraper_1.json"),
+        "high": 600000,
+        "target": 500000,
+        "order": "density",
+        "max_consecutive_failures": 10000,
+        "async": True,
+        "log_level": LOG_SAMPLED,
+    },
+    # faster_fetch_manga.py
+    "fast": {
+        "archive_dir": "raw_archive",
+        "order": "density",
+    },
+    # slower_fetch_manga.py: a small run that only knows the IDs in its own output
+    "slow": {
+        "data_file": "manga.jsonl",
+        "state_file": "manga_id_state.bin",
+        "good_ids_file": None,
+        "bad_ids_file": None,
+        "cursor_file": "manga_cursor.json",
+        "seed_from_data": True,
+        "high": 50000,
+        "target": 1000,
+        "max_consecutive_failures": 50,
+        "max_misses": 50,                # the old MAX_RETRIES: any 50 requests without a capture
+    },
+}
+
+
+def load_config(preset=None, config_file=None, overrides=None):
+    config = dict(DEFAULT_CONFIG)
+    if preset:
+        config.update(PRESETS[preset])
+    if config_file:
+        with open(config_file, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    config.update(overrides or {})
+
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+    if config["transport"] not in TRANSPORTS:
+        raise ValueError(f"transport must be one of {', '.join(TRANSPORTS)}")
+    if config["order"] not in ("shuffled", "density"):
+        raise ValueError("order must be shuffled or density")
+    if config["log_level"] not in (LOG_ALL, LOG_SAMPLED, LOG_QUIET):
+        raise ValueError(f"log_level must be one of {LOG_ALL}, {LOG_SAMPLED}, {LOG_QUIET}")
+    return config
+
+
+def load_history_ids(filename):
+    """IDs already present in a JSONL dataset (so we don't repeat IDs from yesterday)."""
+    if not os.path.exists(filename):
+        return set()
+    result = load_jsonl(filename, fields=["id"])
+    if result.malformed:
+        print(f"Skipped {result.malformed} malformed lines in {filename}")
+    return {manga_id for manga_id in result.column("id") if manga_id is not None}
+
+
+# --- TRANSPORTS ---
+# Both hold one Session for the whole run, so consecutive probes reuse a
+# pooled keep-alive connection instead of paying a TCP+TLS handshake each.
+# The client library is imported on use: only the chosen one must be installed.
+
+class RequestsTransport:
+    """`requests` with a Session whose connection pool is sized to the concurrency."""
+
+    def __init__(self, config):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = config["timeout"]
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config["pool_size"])
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = config["user_agent"]
+
+    def get(self, url, headers=None, timeout=None):
+        return self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+
+    async def aget(self, url, headers=None, timeout=None):
+        # requests is blocking; a worker thread per in-flight request shares the pool
+        return await asyncio.to_thread(self.get, url, headers, timeout)
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        self.session.close()
+
+
+class CurlTransport:
+    """curl_cffi with a browser TLS fingerprint; AsyncSession for async mode."""
+
+    def __init__(self, config):
+        from curl_cffi import requests as curl_requests
+
+        self._curl = curl_requests
+        self.timeout = config["timeout"]
+        self.impersonate = config["impersonate"]
+        self.pool_size = config["pool_size"]
+        self.session = curl_requests.Session(impersonate=self.impersonate)
+        self._async_session = None
+
+    def get(self, url, headers=None, timeout=None):
+        return self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+
+    async def aget(self, url, headers=None, timeout=None):
+        # Created lazily: an AsyncSession belongs to the running event loop
+        if self._async_session is None:
+            self._async_session = self._curl.AsyncSession(impersonate=self.impersonate, max_clients=self.pool_size)
+        return await self._async_session.get(url, headers=headers, timeout=timeout or self.timeout)
+
+    async def aclose(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    def close(self):
+        self.session.close()
+
+
+TRANSPORTS = {
+    "requests": RequestsTransport,
+    "curl_cffi": CurlTransport,
+}
+
+
+class _AsyncView:
+    """The awaitable `get` AsyncCachingSession expects, over a transport's aget."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def get(self, url, headers=None, **kwargs):
+        return await self.transport.aget(url, headers=headers, **kwargs)
+
+
+# --- THE SCRAPER ---
+
+class Scraper:
+    """
+    Probes every unprobed ID in low..high once, in shuffled order, until
+    `target` captures or too many consecutive failures.
+
+    Pass a `limiter` to share a request budget with other processes
+    (see shard_scraper.py); `labels` tag the exported metrics.
+
+    Only one scraper may work a ledger at a time: a second one on the same
+    state_file (and so the same dataset, journal and archive) gets LockHeld.
+    """
+
+    def __init__(self, config, limiter=None, labels=None):
+        self.config = config
+        self.lock = FileLock(config["state_file"] + ".lock").acquire()
+
+        # --- STEP 1: LOAD MEMORY ---
+        # 2-bit-per-ID state file (unknown/good/bad/error); the old text ledgers
+        # are imported into it the first time it is created
+        is_new = not os.path.exists(config["state_file"])
+        self.store = open_store(config["state_file"], config["high"], config["good_ids_file"], config["bad_ids_file"])
+        if is_new and config["seed_from_data"]:
+            for manga_id in load_history_ids(config["data_file"]):
+                if 1 <= manga_id <= config["high"]:
+                    self.store.set(manga_id, GOOD)
+            self.store.flush()
+
+        # Replays a batch left half-applied by a crash before anything else reads the store
+        self.writer = LedgerWriter(config["data_file"], self.store, batch_size=config["batch_size"],
+                                   flush_interval=config["flush_interval"], fsync=config["fsync"])
+
+        # --- STEP 2: PLAN THE SWEEP ---
+        self.scheduler = self.make_scheduler()
+
+        self.transport = TRANSPORTS[config["transport"]](config)
+        # Every captured payload is kept whole, so new fields never need a re-scrape.
+        # A sweep probes each ID once, so next to the archive a response cache
+        # would only store every body a second time
+        self.cache = None
+        if config["cache_dir"] and not config["archive_dir"]:
+            self.cache = ResponseCache(config["cache_dir"], max_bytes=config["cache_max_mb"] * 1024 * 1024,
+                                       expire_after=config["cache_expire_days"] * 86400)
+        self.archive = None
+        if config["archive_dir"]:
+            from payload_archive import PayloadArchive
+            self.archive = PayloadArchive(config["archive_dir"], flush_interval=config["flush_interval"],
+                                          fsync=config["fsync"])
+        self.controller = AimdController(rate=config["start_rate"])
+        self.limiter = limiter or RateLimiter()
+        self.metrics = ScraperMetrics(prom_file=config["metrics_prom_file"], json_file=config["metrics_json_file"],
+                                      export_interval=config["metrics_interval"], log_level=config["log_level"],
+                                      log_every=config["log_every"], labels=labels)
+        self.tag = "".join(f"[{key} {value}] " for key, value in sorted((labels or {}).items()))
+
+        self.success_count = 0
+        self.consecutive_errors = 0
+        self.misses = 0
+
+    def make_scheduler(self):
+        """Every unprobed ID exactly once ("Never Touch Again" Logic)."""
+        config = self.config
+        if config["order"] == "density":
+            # Blocks ranked by the hit rate the ledger predicts for them
+            return DensityScheduler(self.store, config["low"], config["high"],
+                                    block_size=config["block_size"], min_rate=config["min_rate"])
+        # Shuffled; the lookback covers IDs whose results may still be waiting
+        # in an uncommitted batch
+        return SweepScheduler(config["low"], config["high"], self.store.is_done, state_file=config["cursor_file"],
+                              lookback=config["batch_size"] + config["concurrency"])
+
+    def keep_going(self):
+        return (self.success_count < self.config["target"]
+                and self.consecutive_errors <= self.config["max_consecutive_failures"]
+                and (self.config["max_misses"] is None or self.misses < self.config["max_misses"]))
+
+    # --- STEP 3: THE LOOP ---
+    def run(self):
+        print(f"{self.tag}Memory Loaded. Blacklisted: {self.store.count(BAD)} | Completed: {self.store.count(GOOD)}")
+        print(f"{self.tag}Sweep {self.scheduler.progress():.1%} walked. Remaining IDs to probe: {self.scheduler.remaining}")
+        if isinstance(self.scheduler, DensityScheduler):
+            print(f"{self.tag}Density plan: expected yield {self.scheduler.expected_rate:.1%} per request")
+        try:
+            if self.config["async"]:
+                asyncio.run(self.run_async())
+            else:
+                self.run_sync()
+        finally:
+            self.close()
+        print(f"{self.tag}Job Done. Captured {self.success_count}.")
+        return self.success_count
+
+    def run_sync(self):
+        """One request at a time."""
+        http = CachingSession(self.transport, self.cache) if self.cache else self.transport
+        for manga_id in self.scheduler:
+            if not self.keep_going():
+                break
+            self.controller.wait()
+            self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                self.handle(manga_id, http.get(manga_url(manga_id)), started)
+            except Exception as e:
+                self.handle_error(manga_id, e, started)
+
+    async def run_async(self):
+        """`concurrency` workers sharing one sweep iterator, so no two get the same ID."""
+        view = _AsyncView(self.transport)
+        http = AsyncCachingSession(view, self.cache) if self.cache else view
+        sweep = iter(self.scheduler)
+        finished = object()
+
+        async def worker():
+            while self.keep_going():
+                manga_id = next(sweep, finished)
+                if manga_id is finished:
+                    return
+                if manga_id is None:
+                    # Nothing to hand out until another worker's request settles
+                    await asyncio.sleep(0.05)
+                    continue
+                # Counted before the first await, so the scheduler can't end under it
+                self.scheduler.in_flight += 1
+                try:
+                    await self.controller.wait_async()
+                    await self.limiter.acquire_async()
+                    started = time.monotonic()
+                    try:
+                        self.handle(manga_id, await http.get(manga_url(manga_id)), started)
+                    except Exception as e:
+                        self.handle_error(manga_id, e, started)
+                finally:
+                    self.scheduler.in_flight -= 1
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.config["concurrency"])))
+        finally:
+            await self.transport.aclose()
+
+    def handle(self, manga_id, response, started):
+        backoff = self.controller.on_response(response.status_code, response.headers)
+        # Bodies answered from the cache (304 revalidations) cost no download
+        nbytes = 0 if getattr(response, "from_cache", False) else len(response.content or b"")
+        self.metrics.observe(response.status_code, time.monotonic() - started, nbytes)
+        self.refresh_gauges()
+        self.misses += 1
+
+        # --- CASE: BAD ID (404) ---
+        if response.status_code == 404:
+            self.metrics.log(f"{self.tag}-- ID {manga_id} is EMPTY. Blacklisting...")
+            self.writer.mark(manga_id, BAD)
+            return
+
+        # --- CASE: RATE LIMIT (429) / SERVER ERROR (5xx) ---
+        # The controller and limiter are shared, so the backoff holds back every worker
+        if backoff is not None:
+            self.metrics.warn(f"{self.tag}!! Rate Limit ({response.status_code}). Backing off {backoff:.1f}s -> {self.controller.rate:.2f} req/s")
+            self.limiter.pause(backoff)
+            self.scheduler.requeue(manga_id)
+            return
+
+        # --- CASE: SUCCESS (200) ---
+        if response.status_code == 200:
+            record = extract_record(response.json().get("data", {}))
+            if self.archive is not None:
+                self.archive.add(manga_id, response.content, record["fetched_at"])
+            self.writer.add_record(manga_id, record)
+            self.metrics.log(f"{self.tag}++ Captured: {record['title']} [{self.controller.rate:.2f} req/s]")
+            self.success_count += 1
+            self.consecutive_errors = 0
+            self.misses = 0
+            return
+
+        # --- CASE: ANYTHING ELSE (403, 400...) ---
+        self.metrics.warn(f"{self.tag}xx ID {manga_id}: HTTP {response.status_code}")
+        self.writer.mark(manga_id, ERROR)
+
+    def handle_error(self, manga_id, error, started):
+        self.metrics.warn(f"{self.tag}Error: {error}")
+        self.controller.on_error()
+        self.metrics.observe_error(time.monotonic() - started)
+        self.refresh_gauges()
+        self.writer.mark(manga_id, ERROR)
+        self.consecutive_errors += 1
+        self.misses += 1
+
+    def refresh_gauges(self):
+        self.metrics.set_pacing(self.controller.rate, self.controller.backoff_remaining())
+        self.metrics.set_remaining(self.scheduler.remaining)
+        self.metrics.maybe_export()
+
+    def close(self):
+        if self.archive is not None:
+            self.archive.close()
+        self.writer.close()
+        self.scheduler.save()
+        self.metrics.export()
+        self.store.close()
+        self.transport.close()
+        self.lock.release()
+
+
+def parse_setting(text):
+    """KEY=VALUE, with VALUE read as JSON when it parses (numbers, true/false, null)."""
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    try:
+        return key.strip(), json.loads(value)
+    except json.JSONDecodeError:
+        return key.strip(), value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Probe Jikan manga IDs into a JSONL dataset.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="start from one of the old scripts' settings")
+    parser.add_argument("--config", help="JSON file of settings (keys as in DEFAULT_CONFIG)")
+    parser.add_argument("--transport", choices=sorted(TRANSPORTS))
+    parser.add_argument("--low", type=int)
+    parser.add_argument("--high", type=int)
+    parser.add_argument("--target", type=int)
+    parser.add_argument("--data-file", dest="data_file")
+    parser.add_argument("--state-file", dest="state_file")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--async", dest="async", action="store_true", default=None, help="keep several requests in flight")
+    parser.add_argument("--sync", dest="async", action="store_false", help="one request at a time")
+    parser.add_argument("--log-level", dest="log_level", choices=[LOG_ALL, LOG_SAMPLED, LOG_QUIET])
+    parser.add_argument("--set", dest="settings", action="append", type=parse_setting, default=[],
+                        metavar="KEY=VALUE", help="any other setting; repeatable")
+    parser.add_argument("--show-config", action="store_true", help="print the resolved settings and exit")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    overrides = dict(args.settings)
+    for key in ("transport", "low", "high", "target", "data_file", "state_file", "concurrency", "async", "log_level"):
+        value = getattr(args, key)
+        if value is not None:
+            overrides[key] = value
+
+    config = load_config(args.preset, args.config, overrides)
+    if args.show_config:
+        print(json.dumps(config, indent=2))
+        return
+    Scraper(config).run()
+
+
+if __name__ == "__main__":
+    main()
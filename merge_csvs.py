@@ -1,54 +1,236 @@
-import pandas as pd
+import argparse
+import csv
+import glob
+import heapq
+import json
 import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from json_to_csv import (CHUNK_ROWS, SINKS, build_schema, clean_record, format_of, iter_record_chunks,
+                         list_parts, to_table)
 
 # 1. Define your files
-files = ["manga_dataset1.csv", "manga_dataset2.csv"]
-all_dfs = []
+# Globs of CSV / JSONL / Parquet / Arrow shards or part directories; by default
+# whatever json_to_csv.py writes (manga_dataset.parquet, or the manga_dataset/
+# part directory with --incremental)
+INPUT_PATTERNS = ["manga_dataset*.csv", "manga_dataset*.parquet", "manga_dataset*.arrow", "manga_dataset*/"]
+OUTPUT_FILE = "final_manga_dataset_clean.csv"
+CONFLICT_REPORT = "merge_conflicts.csv"
+
+# Fields that don't count as a disagreement between two copies of a record
+VOLATILE_FIELDS = {"fetched_at"}
+
+
+# --- READERS ---
+# Every format is read in chunks of cleaned records (json_to_csv.clean_record),
+# so one shard never has to fit in memory.
+
+def _read_csv(filename, chunk_rows):
+    # on_bad_lines='skip' ensures one bad row doesn't crash the merge
+    for df in pd.read_csv(filename, on_bad_lines="skip", chunksize=chunk_rows):
+        df = df.astype(object).where(df.notna(), None)
+        yield [clean_record(record) for record in df.to_dict("records")]
+
+
+def _read_parquet(filename, chunk_rows):
+    for batch in pq.ParquetFile(filename).iter_batches(batch_size=chunk_rows):
+        yield [clean_record(record) for record in batch.to_pylist()]
+
+
+def _read_arrow(filename, chunk_rows):
+    with ipc.open_file(filename) as reader:
+        for i in range(reader.num_record_batches):
+            yield [clean_record(record) for record in reader.get_batch(i).to_pylist()]
 
-print("Reading files...")
 
-for file in files:
-    if os.path.exists(file):
+def _read_dataset_dir(dirname, chunk_rows):
+    """A part directory written by json_to_csv.py --incremental."""
+    for part in list_parts(dirname):
+        yield from _read_parquet(part, chunk_rows)
+
+
+READERS = {
+    ".csv": _read_csv,
+    ".jsonl": iter_record_chunks,
+    ".parquet": _read_parquet,
+    ".arrow": _read_arrow,
+}
+
+
+def read_chunks(filename, chunk_rows=CHUNK_ROWS):
+    if os.path.isdir(filename):
+        return _read_dataset_dir(filename, chunk_rows)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"Don't know how to read {filename}")
+    return READERS[ext](filename, chunk_rows)
+
+
+def expand_inputs(patterns):
+    """Files matching the globs, each once, in pattern order (sorted within a pattern)."""
+    files = []
+    for pattern in patterns:
+        for filename in sorted(glob.glob(pattern)):
+            if filename not in files:
+                files.append(filename)
+    return files
+
+
+# --- PHASE 1: SORTED RUNS ---
+def write_runs(files, run_dir, chunk_rows=CHUNK_ROWS):
+    """
+    Cuts every input into chunks sorted by id and spills each to a run file.
+    Lines are [id, source, seq, record]; (source, seq) keeps input order stable.
+
+    Returns:
+        tuple: (run_files, rows_read, rows_without_id)
+    """
+    runs = []
+    rows = missing = 0
+    for source, filename in enumerate(files):
         try:
-            # Read CSV
-            # on_bad_lines='skip' ensures one bad row doesn't crash the script
-            df = pd.read_csv(file, on_bad_lines='skip')
-            
-            # Print stats so you know it worked
-            print(f"  -> Loaded {file}: {len(df)} rows")
-            all_dfs.append(df)
+            seq = 0
+            count = 0
+            for records in read_chunks(filename, chunk_rows):
+                keyed = []
+                for record in records:
+                    seq += 1
+                    if record.get("id") is None:
+                        missing += 1
+                        continue
+                    keyed.append((record["id"], source, seq, record))
+                keyed.sort(key=lambda item: item[:3])
+                count += len(records)
+
+                run_file = os.path.join(run_dir, f"run_{len(runs):05d}.jsonl")
+                with open(run_file, "w", encoding="utf-8") as f:
+                    for item in keyed:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                runs.append(run_file)
+            print(f"  -> Loaded {filename}: {count} rows")
+            rows += count
         except Exception as e:
-            print(f"  xx Failed to read {file}: {e}")
-    else:
-        print(f"  xx File not found: {file}")
-
-# 2. Merge (Concatenate)
-if all_dfs:
-    print("\nMerging data...")
-    # ignore_index=True resets the index so you don't have duplicate row numbers (0, 1, 2, 0, 1, 2...)
-    final_df = pd.concat(all_dfs, ignore_index=True)
-    
-    initial_count = len(final_df)
-    
-    # 3. Clean Duplicates (Crucial for Scraped Data)
-    # subset=['id'] ensures we check for duplicate manga IDs. 
-    # If your ID column is named 'mal_id', change 'id' to 'mal_id'.
-    if 'id' in final_df.columns:
-        final_df = final_df.drop_duplicates(subset=['id'], keep='first')
-    else:
-        # Fallback: drop if ALL columns are identical
-        final_df = final_df.drop_duplicates(keep='first')
-        
-    print(f"  -> Removed {initial_count - len(final_df)} duplicates.")
-    final_df["id"]=final_df["id"].round().astype("Int64")
-    # 4. Save
-    output_filename = "final_manga_dataset_clean.csv"
-    # index=False prevents creating that annoying 'Unnamed: 0' column
-    final_df.to_csv(output_filename, index=False, encoding='utf-8')
-    print(f"\nSuccess! Saved {len(final_df)} unique rows to '{output_filename}'")
-    
-    # Preview
-    print(final_df.head())
-
-else:
-    print("\nNo data found. Check your file names.")
\ No newline at end of file
+            print(f"  xx Failed to read {filename}: {e}")
+    return runs, rows, missing
+
+
+def _read_run(run_file):
+    with open(run_file, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+# --- PHASE 2: K-WAY MERGE ---
+def _fetched(record):
+    return record.get("fetched_at") if record.get("fetched_at") is not None else -1
+
+
+def pick_winner(group):
+    """Freshest fetched_at wins; on a tie (or no timestamps) the earlier input wins."""
+    best = group[0]
+    for item in group[1:]:
+        if _fetched(item[3]) > _fetched(best[3]):
+            best = item
+    return best
+
+
+def differing_fields(group):
+    fields = set()
+    first = group[0][3]
+    for _, _, _, record in group[1:]:
+        for key in set(first) | set(record):
+            if key not in VOLATILE_FIELDS and first.get(key) != record.get(key):
+                fields.add(key)
+    return sorted(fields)
+
+
+def merge_runs(runs):
+    """Yields (winner_item, group) per id, in id order, holding one row per run in memory."""
+    streams = [_read_run(run_file) for run_file in runs]
+    group = []
+    for item in heapq.merge(*streams, key=lambda item: (item[0], item[1], item[2])):
+        if group and item[0] != group[0][0]:
+            yield pick_winner(group), group
+            group = []
+        group.append(item)
+    if group:
+        yield pick_winner(group), group
+
+
+def merge(files, output_file, report_file, chunk_rows=CHUNK_ROWS):
+    """
+    Bounded-memory merge of every input into one dataset sorted by id, one
+    row per id. Groups whose copies disagree on anything but fetched_at are
+    written to `report_file`.
+
+    Returns:
+        dict: counts for the summary
+    """
+    sink_class = SINKS[format_of(output_file)]
+    stats = {"rows": 0, "unique": 0, "duplicates": 0, "conflicts": 0, "missing_id": 0}
+
+    run_dir = tempfile.mkdtemp(prefix="merge_runs_", dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        runs, stats["rows"], stats["missing_id"] = write_runs(files, run_dir, chunk_rows)
+
+        print("\nMerging data...")
+        sink = schema = None
+        buffer = []
+        with open(report_file, "w", newline="", encoding="utf-8") as rf:
+            report = csv.writer(rf)
+            report.writerow(["id", "copies", "winner", "winner_fetched_at", "others", "fields"])
+
+            for winner, group in merge_runs(runs):
+                stats["unique"] += 1
+                stats["duplicates"] += len(group) - 1
+                fields = differing_fields(group) if len(group) > 1 else []
+                if fields:
+                    stats["conflicts"] += 1
+                    others = "; ".join(f"{files[item[1]]}@{item[3].get('fetched_at')}" for item in group if item is not winner)
+                    report.writerow([winner[0], len(group), files[winner[1]], winner[3].get("fetched_at"), others, ", ".join(fields)])
+
+                buffer.append(winner[3])
+                if len(buffer) >= chunk_rows:
+                    if sink is None:
+                        schema = build_schema(buffer)
+                        sink = sink_class(output_file, schema)
+                    sink.write(to_table(buffer, schema))
+                    buffer = []
+
+        if buffer or sink is None:
+            if sink is None:
+                schema = build_schema(buffer)
+                sink = sink_class(output_file, schema)
+            if buffer:
+                sink.write(to_table(buffer, schema))
+        sink.close()
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge dataset shards into one deduplicated dataset (freshest record wins).")
+    parser.add_argument("patterns", nargs="*", default=INPUT_PATTERNS, help="globs of .csv/.jsonl/.parquet/.arrow files or part directories")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE, help="output file; format from its extension")
+    parser.add_argument("--report", default=CONFLICT_REPORT, help="CSV of ids whose copies disagreed")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    files = [f for f in expand_inputs(args.patterns) if os.path.abspath(f) != os.path.abspath(args.output)]
+    if not files:
+        print("\nNo data found. Check your file names.")
+        exit()
+
+    print("Reading files...")
+    stats = merge(files, args.output, args.report, args.chunk_rows)
+
+    print(f"  -> Removed {stats['duplicates']} duplicates ({stats['conflicts']} with differing values, see '{args.report}').")
+    if stats["missing_id"]:
+        print(f"  -> Dropped {stats['missing_id']} rows without an id.")
+    print(f"\nSuccess! Saved {stats['unique']} unique rows to '{args.output}'")
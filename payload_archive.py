@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import time
+
+import zstandard as zstd
+
+from file_lock import FileLock, LockHeld
+from jikan import extract_record, FIELDS, DEFAULT_FIELDS
+
+script_dir=os.path.dirname(os.path.abspath(__file__))
+
+STATE_FILE = os.path.join(script_dir,"id_state_1.bin")   # Ledger of the scraper that appends to the dataset
+
+
+class PayloadArchive:
+    """
+    Append-only archive of raw /full payloads, so a new field can be
+    re-extracted from disk instead of re-fetched at 1.5s per title.
+
+    Layout under `archive_dir`:
+        chunk_00000.zst ...   -> zstd frames; each frame holds up to `frame_records` payloads back to back
+        index.tsv             -> id, chunk, frame offset, frame length, start, size, fetched_at
+
+    Payloads are compressed together in frames (they share most of their
+    keys, so a frame compresses far better than single payloads), and a
+    chunk is closed once it passes `chunk_bytes`. A later index line for the
+    same ID (a refresh) supersedes the earlier one.
+
+    Frames are written before their index lines, so a crash leaves at most
+    an unindexed tail, which is cut off on the next open.
+
+    Only one writer may have an archive open: the tail it cuts off on open
+    and the chunk size it takes its offsets from would otherwise belong to
+    another process's frames, so a second writer gets LockHeld.
+    `read_only` opens skip the lock and never truncate anything.
+    """
+
+    def __init__(self, archive_dir, chunk_bytes=256 * 1024 * 1024, frame_records=64, flush_interval=5.0,
+                 level=10, fsync=True, read_only=False):
+        self.archive_dir = archive_dir
+        self.index_file = os.path.join(archive_dir, "index.tsv")
+        self.chunk_bytes = chunk_bytes
+        self.frame_records = frame_records
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.read_only = read_only
+        self._compressor = zstd.ZstdCompressor(level=level)
+        self._decompressor = zstd.ZstdDecompressor()
+
+        self._lock = None
+        if not read_only:
+            os.makedirs(archive_dir, exist_ok=True)
+            self._lock = FileLock(os.path.join(archive_dir, "writer.lock")).acquire()
+        # id -> (chunk, offset, length, start, size, fetched_at)
+        self.index = {}
+        self._pending = []
+        self._first_pending = None
+
+        self.chunk = self._recover()
+        if self._chunk_size(self.chunk) >= self.chunk_bytes:
+            self.chunk += 1
+
+    def _chunk_path(self, chunk):
+        return os.path.join(self.archive_dir, f"chunk_{chunk:05d}.zst")
+
+    def _chunk_size(self, chunk):
+        path = self._chunk_path(chunk)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    # --- RECOVERY ---
+    def _recover(self):
+        """Loads the index, dropping a torn last line and any unindexed chunk tail. Returns the last chunk."""
+        if not os.path.exists(self.index_file):
+            return 0
+
+        good_bytes = 0
+        ends = {}
+        with open(self.index_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    manga_id, chunk, offset, length, start, size, fetched_at = map(int, line.split(b"\t"))
+                except ValueError:
+                    break
+                good_bytes += len(line)
+                self.index[manga_id] = (chunk, offset, length, start, size, fetched_at)
+                ends[chunk] = max(ends.get(chunk, 0), offset + length)
+
+        if self.read_only:
+            return max(ends) if ends else 0
+
+        if good_bytes < os.path.getsize(self.index_file):
+            with open(self.index_file, "r+b") as f:
+                f.truncate(good_bytes)
+
+        last_chunk = max(ends) if ends else 0
+        if self._chunk_size(last_chunk) > ends.get(last_chunk, 0):
+            with open(self._chunk_path(last_chunk), "r+b") as f:
+                f.truncate(ends.get(last_chunk, 0))
+        return last_chunk
+
+    # --- WRITING ---
+    def add(self, manga_id, payload, fetched_at=None):
+        """Queues one raw response body (bytes or str) for the next frame."""
+        if self.read_only:
+            raise ValueError(f"{self.archive_dir} is open read-only")
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+        self._pending.append((manga_id, payload, int(time.time() if fetched_at is None else fetched_at)))
+        if len(self._pending) >= self.frame_records or time.monotonic() - self._first_pending >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        frame = self._compressor.compress(b"".join(payload for _, payload, _ in self._pending))
+        offset = self._chunk_size(self.chunk)
+        with open(self._chunk_path(self.chunk), "ab") as f:
+            f.write(frame)
+            self._sync(f)
+
+        lines = []
+        start = 0
+        for manga_id, payload, fetched_at in self._pending:
+            entry = (self.chunk, offset, len(frame), start, len(payload), fetched_at)
+            self.index[manga_id] = entry
+            lines.append("\t".join(map(str, (manga_id,) + entry)) + "\n")
+            start += len(payload)
+        with open(self.index_file, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            self._sync(f)
+
+        self._pending = []
+        self._first_pending = None
+        if offset + len(frame) >= self.chunk_bytes:
+            self.chunk += 1
+
+    def merge_from(self, other):
+        """Adds every payload of `other` fetched later than the one kept here. Returns how many."""
+        added = 0
+        for manga_id, payload, fetched_at in other.iter_payloads():
+            entry = self.index.get(manga_id)
+            if entry is None or fetched_at > entry[5]:
+                self.add(manga_id, payload, fetched_at)
+                added += 1
+        self.flush()
+        return added
+
+    def close(self):
+        self.flush()
+        if self._lock is not None:
+            self._lock.release()
+            self._lock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- READING ---
+    def __contains__(self, manga_id):
+        return manga_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _read_frame(self, f, offset, length):
+        f.seek(offset)
+        return self._decompressor.decompress(f.read(length))
+
+    def get(self, manga_id):
+        """Raw payload for one ID, or None."""
+        entry = self.index.get(manga_id)
+        if entry is None:
+            return None
+        chunk, offset, length, start, size, _ = entry
+        with open(self._chunk_path(chunk), "rb") as f:
+            return self._read_frame(f, offset, length)[start:start + size]
+
+    def iter_payloads(self):
+        """
+        Yields (id, payload, fetched_at) for the current payload of every ID,
+        reading each chunk front to back and decompressing each frame once.
+        """
+        frames = {}
+        for manga_id, (chunk, offset, length, start, size, fetched_at) in self.index.items():
+            frames.setdefault((chunk, offset, length), []).append((manga_id, start, size, fetched_at))
+
+        open_chunk = f = None
+        try:
+            for chunk, offset, length in sorted(frames):
+                if chunk != open_chunk:
+                    if f is not None:
+                        f.close()
+                    f = open(self._chunk_path(chunk), "rb")
+                    open_chunk = chunk
+                blob = self._read_frame(f, offset, length)
+                for manga_id, start, size, fetched_at in frames[(chunk, offset, length)]:
+                    yield manga_id, blob[start:start + size], fetched_at
+        finally:
+            if f is not None:
+                f.close()
+
+    def stats(self):
+        chunks = sorted({entry[0] for entry in self.index.values()})
+        stored = sum(self._chunk_size(chunk) for chunk in chunks)
+        raw = sum(entry[4] for entry in self.index.values())
+        return {"payloads": len(self.index), "chunks": len(chunks), "raw_bytes": raw, "stored_bytes": stored}
+
+
+def reextract(archive, out_file, fields=DEFAULT_FIELDS, keep_unarchived=True, state_file=STATE_FILE):
+    """
+    Rebuilds a JSONL dataset from the archive with the given field projection.
+
+    Each row keeps the fetch time of its payload. Rows of `out_file` whose ID
+    was never archived (scraped before the archive existed) are kept as they
+    are unless `keep_unarchived` is False. The file is replaced atomically.
+
+    The lock of the ledger behind `out_file` (`state_file`) is held
+    throughout, so rows a scraper appended meanwhile can't be lost to the
+    rewrite: raises LockHeld while one is running.
+
+    Returns:
+        tuple: (extracted, kept)
+    """
+    with FileLock(state_file + ".lock"):
+        return _reextract(archive, out_file, fields, keep_unarchived)
+
+
+def _reextract(archive, out_file, fields, keep_unarchived):
+    if "id" not in fields:
+        fields = ("id",) + tuple(fields)
+    records = {}
+    for manga_id, payload, fetched_at in archive.iter_payloads():
+        try:
+            data = json.loads(payload).get("data", {})
+        except json.JSONDecodeError:
+            continue
+        records[manga_id] = extract_record(data, fetched_at, fields)
+    extracted = len(records)
+
+    kept = 0
+    if keep_unarchived and os.path.exists(out_file):
+        with open(out_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("id") is not None and record["id"] not in records:
+                    records[record["id"]] = record
+                    kept += 1
+
+    tmp_file = out_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for manga_id in sorted(records):
+            f.write(json.dumps(records[manga_id], ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, out_file)
+    return extracted, kept
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the raw payload archive or re-extract a dataset from it.")
+    parser.add_argument("archive_dir")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="payload count and compression ratio")
+    show = sub.add_parser("show", help="print one raw payload")
+    show.add_argument("id", type=int)
+    extract = sub.add_parser("extract", help="rebuild a JSONL dataset with a new field projection")
+    extract.add_argument("out_file")
+    extract.add_argument("--fields", default=",".join(DEFAULT_FIELDS),
+                         help=f"comma-separated, from: {', '.join(FIELDS)}")
+    extract.add_argument("--drop-unarchived", action="store_true",
+                         help="don't keep rows of OUT_FILE that have no archived payload")
+    extract.add_argument("--state-file", default=STATE_FILE,
+                         help="ledger of the scraper writing OUT_FILE; its lock is held during the rewrite")
+    args = parser.parse_args()
+
+    archive = PayloadArchive(args.archive_dir, read_only=True)
+    if args.command == "stats":
+        stats = archive.stats()
+        ratio = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0
+        print(f"{stats['payloads']} payloads in {stats['chunks']} chunk(s): "
+              f"{stats['raw_bytes'] / 1e6:.1f} MB raw -> {stats['stored_bytes'] / 1e6:.1f} MB stored ({ratio:.1f}x)")
+    elif args.command == "show":
+        payload = archive.get(args.id)
+        print(payload.decode("utf-8") if payload is not None else f"ID {args.id} is not archived")
+    else:
+        fields = [name.strip() for name in args.fields.split(",") if name.strip()]
+        unknown = [name for name in fields if name not in FIELDS]
+        if unknown:
+            parser.error(f"unknown field(s): {', '.join(unknown)}")
+        started = time.time()
+        try:
+            extracted, kept = reextract(archive, args.out_file, fields, keep_unarchived=not args.drop_unarchived,
+                                        state_file=args.state_file)
+        except LockHeld as e:
+            parser.exit(1, f"Scraper running ({e}); not rewriting {args.out_file}\n")
+        print(f"Wrote {args.out_file}: {extracted} re-extracted, {kept} kept without a payload ({time.time() - started:.1f}s)")
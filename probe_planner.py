@@ -0,0 +1,196 @@
+import argparse
+import os
+from collections import deque
+
+from id_store import IdStore, open_store, UNKNOWN, GOOD, BAD, ERROR
+
+script_dir=os.path.dirname(os.path.abspath(__file__))
+
+# --- FILES ---
+BAD_IDS_FILE = os.path.join(script_dir,"bad_ids_1.txt")
+GOOD_IDS_FILE = os.path.join(script_dir,"good_ids_1.txt")
+STATE_FILE = os.path.join(script_dir,"id_state_1.bin")
+HIGH_RANGE=600000
+
+# --- ESTIMATOR ---
+BLOCK_SIZE = 1000        # IDs per block (a multiple of 4)
+NEIGHBOUR_RADIUS = 2     # Blocks on each side whose probes also inform a block's estimate...
+NEIGHBOUR_WEIGHT = 0.5   # ...at this weight
+PRIOR_STRENGTH = 20      # Pseudo-probes at the global hit rate, so thin evidence stays near the mean
+
+
+def estimate_blocks(store, low, high, block_size=BLOCK_SIZE, radius=NEIGHBOUR_RADIUS,
+                    neighbour_weight=NEIGHBOUR_WEIGHT, prior_strength=PRIOR_STRENGTH):
+    """
+    Estimated hit rate (chance a probe returns 200) of every block overlapping low..high.
+
+    A block's own good/bad counts are pooled with its neighbours' at a lower
+    weight - valid IDs come in runs, so an unprobed block surrounded by dead
+    ones is probably dead too - and shrunk towards the global hit rate:
+
+        rate = (good + prior_strength * global_rate) / (good + bad + prior_strength)
+
+    ERROR IDs count as unprobed.
+
+    Returns:
+        list: {"start", "end", "good", "bad", "open", "rate"} per block, in ID order
+    """
+    counts = store.block_counts(block_size)
+    total_good = sum(block[GOOD] for block in counts)
+    total_bad = sum(block[BAD] for block in counts)
+    global_rate = total_good / (total_good + total_bad) if total_good + total_bad else 0.5
+
+    blocks = []
+    for index, block in enumerate(counts):
+        start = max(index * block_size, low, 1)
+        end = min((index + 1) * block_size - 1, high, store.high)
+        if start > end:
+            continue
+
+        good = bad = 0.0
+        for other in range(max(0, index - radius), min(len(counts), index + radius + 1)):
+            weight = 1.0 if other == index else neighbour_weight
+            good += weight * counts[other][GOOD]
+            bad += weight * counts[other][BAD]
+        rate = (good + prior_strength * global_rate) / (good + bad + prior_strength)
+
+        # Open = still to probe; a block cut by low/high is counted ID by ID
+        if start == max(index * block_size, 1) and end == min((index + 1) * block_size - 1, store.high):
+            open_ids = block[UNKNOWN] + block[ERROR]
+        else:
+            open_ids = sum(1 for manga_id in range(start, end + 1) if store.get(manga_id) in (UNKNOWN, ERROR))
+        blocks.append({"start": start, "end": end, "good": block[GOOD], "bad": block[BAD],
+                       "open": open_ids, "rate": rate})
+    return blocks
+
+
+def rank_blocks(blocks, min_rate=0.0):
+    """Blocks that still have IDs to probe, best expected yield first."""
+    ranked = [block for block in blocks if block["open"] and block["rate"] >= min_rate]
+    ranked.sort(key=lambda block: (-block["rate"], block["start"]))
+    return ranked
+
+
+def expected_captures(ranked, budget):
+    """Expected 200s from spending `budget` probes down the ranking."""
+    captures = 0.0
+    for block in ranked:
+        spend = min(budget, block["open"])
+        captures += spend * block["rate"]
+        budget -= spend
+        if budget <= 0:
+            break
+    return captures
+
+
+class DensityScheduler:
+    """
+    Drop-in for SweepScheduler that probes the highest-yield blocks first.
+
+    The ranking is recomputed from the live store every time a block is
+    finished, so each block's results sharpen the estimates of the rest.
+    No cursor file is needed: the store already records what was probed.
+
+    Concurrent consumers count their unfinished requests in `in_flight`:
+    while any remain, one of them may still be requeued, so once the blocks
+    are walked the generator yields None ("nothing yet, ask again")
+    instead of ending.
+    """
+
+    def __init__(self, store, low, high, block_size=BLOCK_SIZE, min_rate=0.0):
+        self.store = store
+        self.low = low
+        self.high = high
+        self.block_size = block_size
+        self.min_rate = min_rate
+        self.retry = deque()
+        self.in_flight = 0
+
+        ranked = rank_blocks(estimate_blocks(store, low, high, block_size), min_rate)
+        self.planned = sum(block["open"] for block in ranked)
+        self.remaining = self.planned
+        self.handed_out = 0
+        self.expected_rate = expected_captures(ranked, self.planned) / self.planned if self.planned else 0.0
+
+    def requeue(self, manga_id):
+        """Hands `manga_id` out again before the walk continues (e.g. after a 429)."""
+        self.retry.append(manga_id)
+        self.remaining += 1
+
+    def _open(self, manga_id):
+        return self.store.get(manga_id) in (UNKNOWN, ERROR)
+
+    def __iter__(self):
+        visited = set()
+        while True:
+            ranked = [block for block in rank_blocks(estimate_blocks(self.store, self.low, self.high, self.block_size),
+                                                     self.min_rate)
+                      if block["start"] not in visited]
+            if not ranked:
+                break
+            block = ranked[0]
+            visited.add(block["start"])
+
+            for manga_id in range(block["start"], block["end"] + 1):
+                while self.retry:
+                    self.remaining -= 1
+                    yield self.retry.popleft()
+                if not self._open(manga_id):
+                    continue
+                self.remaining = max(0, self.remaining - 1)
+                self.handed_out += 1
+                yield manga_id
+
+        while self.retry or self.in_flight:
+            if self.retry:
+                self.remaining -= 1
+                yield self.retry.popleft()
+            else:
+                yield None
+
+    def save(self):
+        pass
+
+    def progress(self):
+        """Fraction of the planned IDs handed out so far."""
+        return self.handed_out / self.planned if self.planned else 1.0
+
+
+def report(store, low, high, block_size, budgets, top):
+    blocks = estimate_blocks(store, low, high, block_size)
+    ranked = rank_blocks(blocks)
+    open_total = sum(block["open"] for block in ranked)
+    uniform_rate = expected_captures(ranked, open_total) / open_total if open_total else 0.0
+
+    print(f"IDs {low}..{high} in blocks of {block_size}: {store.count(GOOD)} good, {store.count(BAD)} bad, "
+          f"{open_total} still to probe")
+    print(f"\nTop {top} blocks by expected yield:")
+    print(f"  {'block':>17} {'good':>6} {'bad':>6} {'open':>6} {'hit rate':>9}")
+    for block in ranked[:top]:
+        print(f"  {block['start']:>8}..{block['end']:<8} {block['good']:>6} {block['bad']:>6} {block['open']:>6} {block['rate']:>9.1%}")
+
+    print(f"\n  {'budget':>8} {'planned':>10} {'per req':>8} {'uniform':>10} {'per req':>8}")
+    for budget in budgets:
+        spend = min(budget, open_total)
+        if spend <= 0:
+            break
+        planned = expected_captures(ranked, spend)
+        print(f"  {spend:>8} {planned:>10.0f} {planned / spend:>8.1%} {spend * uniform_rate:>10.0f} {uniform_rate:>8.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate per-block hit rates from the ID ledger and plan probes.")
+    parser.add_argument("--state-file", default=STATE_FILE)
+    parser.add_argument("--low", type=int, default=1)
+    parser.add_argument("--high", type=int, default=HIGH_RANGE)
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--budget", type=int, nargs="+", default=[1000, 10000, 50000], help="request budgets to price")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if os.path.exists(args.state_file):
+        store = IdStore(args.state_file, args.high)
+    else:
+        store = open_store(args.state_file, args.high, GOOD_IDS_FILE, BAD_IDS_FILE)
+    with store:
+        report(store, args.low, args.high, args.block_size, args.budget, args.top)
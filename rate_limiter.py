@@ -0,0 +1,235 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from jikan import PER_SECOND_LIMIT, PER_MINUTE_LIMIT
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self, now, seconds):
+        """Empties the bucket so nothing is granted for the next `seconds`."""
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """
+    Grants one request slot only when every bucket has a token.
+
+    The same limiter can be shared by a blocking loop (acquire) and by
+    asyncio workers (acquire_async), so all requests count against one budget.
+    """
+
+    def __init__(self, per_second=PER_SECOND_LIMIT, per_minute=PER_MINUTE_LIMIT):
+        self.buckets = [
+            TokenBucket(per_second, per_second),
+            TokenBucket(per_minute / 60, per_minute),
+        ]
+        self._lock = threading.Lock()
+
+    def _try_take(self):
+        """Takes a slot and returns 0, or returns how long to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(bucket.wait_time(now) for bucket in self.buckets)
+            if wait <= 0:
+                for bucket in self.buckets:
+                    bucket.take()
+            return wait
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits (without blocking the event loop) until a request may be sent."""
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds back every caller for `seconds`, e.g. after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets:
+                bucket.drain(now, seconds)
+
+
+class SharedRateLimiter:
+    """
+    RateLimiter whose buckets live in shared memory, so worker processes
+    started with it draw from one global budget. Create it in the parent and
+    pass it to each multiprocessing.Process.
+    """
+
+    def __init__(self, per_second=PER_SECOND_LIMIT, per_minute=PER_MINUTE_LIMIT):
+        self.rates = (float(per_second), per_minute / 60)
+        self.capacities = (float(per_second), float(per_minute))
+        now = time.monotonic()
+        # [tokens, updated] per bucket
+        self._state = multiprocessing.Array("d", [self.capacities[0], now, self.capacities[1], now])
+
+    def _refill(self, i, now):
+        """Brings bucket i up to `now` (call with the lock held). Returns its tokens."""
+        tokens, updated = self._state[2 * i], self._state[2 * i + 1]
+        tokens = min(self.capacities[i], tokens + max(0.0, now - updated) * self.rates[i])
+        self._state[2 * i], self._state[2 * i + 1] = tokens, now
+        return tokens
+
+    def _try_take(self):
+        with self._state.get_lock():
+            now = time.monotonic()
+            wait = 0.0
+            for i, rate in enumerate(self.rates):
+                tokens = self._refill(i, now)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if wait <= 0:
+                for i in range(len(self.rates)):
+                    self._state[2 * i] -= 1
+            return wait
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits (without blocking the event loop) until a request may be sent."""
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds back every process for `seconds`."""
+        with self._state.get_lock():
+            # Refilled first, as TokenBucket.drain: a stale timestamp would
+            # credit the time before the pause and cut it short
+            now = time.monotonic()
+            for i, rate in enumerate(self.rates):
+                self._state[2 * i] = min(self._refill(i, now), -seconds * rate)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AimdController:
+    """
+    Adaptive pacing: additive increase, multiplicative decrease.
+
+    Every good response nudges the rate up by `increase` req/s (up to
+    `max_rate`); a 429, a 5xx or a network error cuts it by `decrease`
+    (down to `min_rate`) and honors Retry-After when the server sends one.
+    Every caller reserves its own send slot, 1/rate after the one before, so
+    concurrent workers are spaced out instead of all firing at once. A 404
+    probe then gives back all but `probe_cost` of its spacing, so empty IDs
+    don't pay the same wait as captures.
+
+    Works for the blocking loops (wait) and asyncio workers (wait_async);
+    `rate` is the current request rate in requests per second.
+    """
+
+    def __init__(self, rate=1 / 1.5, min_rate=0.1, max_rate=PER_SECOND_LIMIT,
+                 increase=0.05, decrease=0.5, probe_cost=0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.probe_cost = probe_cost
+        self.next_slot = time.monotonic()
+        self.backoffs = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Claims the next send slot. Returns the seconds until it comes."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1 / self.rate
+            return slot - now
+
+    def wait(self):
+        time.sleep(self._reserve())
+
+    async def wait_async(self):
+        await asyncio.sleep(self._reserve())
+
+    def _push(self, seconds):
+        now = time.monotonic()
+        self.next_slot = max(self.next_slot, now) + seconds
+
+    def on_response(self, status_code, headers=None):
+        """
+        Adjusts the rate from one response. Returns the backoff in seconds
+        for a 429/5xx (0.0 after Retry-After: 0), None for any other response.
+        """
+        with self._lock:
+            if status_code == 429 or status_code >= 500:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.backoffs += 1
+                retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+                pause = retry_after if retry_after is not None else 1 / self.rate
+                self._push(pause)
+                return pause
+
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            if status_code == 404:
+                refund = (1 - self.probe_cost) / self.rate
+                self.next_slot = max(time.monotonic(), self.next_slot - refund)
+            return None
+
+    def on_error(self):
+        """A timeout or connection error counts as a sign of overload."""
+        return self.on_response(599)
+
+    def backoff_remaining(self):
+        """Seconds until the next request is allowed."""
+        return max(0.0, self.next_slot - time.monotonic())
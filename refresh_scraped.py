@@ -0,0 +1,165 @@
+from curl_cffi import requests
+import heapq
+import json
+import math
+import os
+import time
+
+from jikan import manga_url, extract_record, FIELDS, DEFAULT_FIELDS
+from rate_limiter import RateLimiter, AimdController
+from id_store import open_store
+from batch_writer import LedgerWriter
+from file_lock import FileLock, LockHeld
+from response_cache import ResponseCache, CachingSession
+from payload_archive import PayloadArchive
+
+script_dir=os.path.dirname(os.path.abspath(__file__))
+
+# --- FILES ---
+DATA_FILE = os.path.join(script_dir,"manga_data_full_1.jsonl")
+BAD_IDS_FILE = os.path.join(script_dir,"bad_ids_1.txt")
+GOOD_IDS_FILE = os.path.join(script_dir,"good_ids_1.txt")
+STATE_FILE = os.path.join(script_dir,"id_state_1.bin")
+CACHE_DIR = os.path.join(script_dir,"http_cache_1")
+ARCHIVE_DIR = os.path.join(script_dir,"raw_archive_1")   # Refreshed payloads supersede the archived ones
+HIGH_RANGE=600000
+
+# --- REFRESH POLICY ---
+REQUEST_BUDGET = 500       # Max requests per run
+CHECKPOINT_EVERY = 100     # Upsert refreshed rows into DATA_FILE this often
+MIN_AGE_HOURS = 24         # Rows fetched more recently than this are left alone
+
+
+def load_dataset(filename):
+    """Reads the JSONL into {id: record}; a later line for the same ID wins."""
+    records = {}
+    if not os.path.exists(filename):
+        return records
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("id") is not None:
+                records[record["id"]] = record
+    return records
+
+
+def refresh_priority(record, now):
+    """
+    Oldest first, weighted by popularity: a title with 100k members is due
+    about 6x sooner than one nobody follows. Rows scraped before fetch
+    timestamps existed count as fetched at time 0.
+    """
+    age = now - (record.get("fetched_at") or 0)
+    members = record.get("members") or 0
+    return age * (1 + math.log10(1 + members))
+
+
+def pick_due(records, budget, now, min_age):
+    due = [r for r in records.values() if now - (r.get("fetched_at") or 0) >= min_age]
+    return heapq.nlargest(budget, due, key=lambda r: refresh_priority(r, now))
+
+
+def refreshed_record(old, data):
+    """
+    The row re-extracted from a fresh payload, over the union of the old
+    row's columns and the default fields: every column jikan.FIELDS knows is
+    re-extracted (so fields added by a re-extraction stay), any other column
+    keeps its old value.
+    """
+    fields = DEFAULT_FIELDS + tuple(name for name in old if name in FIELDS and name not in DEFAULT_FIELDS)
+    return {**old, **extract_record(data, fields=fields)}
+
+
+def upsert_dataset(filename, records):
+    """Rewrites the JSONL with one line per ID, replacing the file atomically."""
+    tmp_file = filename + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for record in records.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, filename)
+
+
+def refresh(http, records, budget, limiter, controller, archive=None):
+    now = time.time()
+    queue = pick_due(records, budget, now, MIN_AGE_HOURS * 3600)
+    print(f"{len(queue)} of {len(records)} manga due for refresh (budget {budget})")
+
+    requests_used = updated = unchanged = 0
+    since_checkpoint = 0
+
+    while queue and requests_used < budget:
+        old = queue[0]
+        controller.wait()
+        limiter.acquire()
+        requests_used += 1
+
+        try:
+            response = http.get(manga_url(old["id"]), timeout=10)
+            backoff = controller.on_response(response.status_code, response.headers)
+
+            # --- CASE: RATE LIMIT (429) / SERVER ERROR (5xx) ---
+            # The title stays at the head of the queue and is retried
+            if backoff is not None:
+                print(f"!! Rate Limit ({response.status_code}). Backing off {backoff:.1f}s -> {controller.rate:.2f} req/s")
+                continue
+
+            queue.pop(0)
+
+            if response.status_code != 200:
+                print(f"xx ID {old['id']}: HTTP {response.status_code}, keeping the old row")
+                continue
+
+            record = refreshed_record(old, response.json().get("data", {}))
+            # A 304 served from the cache means nothing changed upstream
+            if getattr(response, "revalidated", False):
+                unchanged += 1
+            else:
+                updated += 1
+                print(f"~~ {record['title']}: score {old.get('score')} -> {record['score']}, members {old.get('members')} -> {record['members']}")
+            records[old["id"]] = record
+            # Keeps a later re-extraction from reverting the row to the old payload
+            if archive is not None:
+                archive.add(old["id"], response.content, record["fetched_at"])
+
+            since_checkpoint += 1
+            if since_checkpoint >= CHECKPOINT_EVERY:
+                upsert_dataset(DATA_FILE, records)
+                since_checkpoint = 0
+
+        except Exception as e:
+            print(f"Error: {e}")
+            controller.on_error()
+            queue.pop(0)
+
+    upsert_dataset(DATA_FILE, records)
+    return requests_used, updated, unchanged
+
+
+if __name__ == "__main__":
+    # The ledger lock is held until DATA_FILE is rewritten for the last time:
+    # a scraper appending meanwhile would lose its rows to the rewrite
+    try:
+        lock = FileLock(STATE_FILE + ".lock").acquire()
+    except LockHeld as e:
+        print(f"Scraper running ({e}); not refreshing")
+        exit()
+
+    with lock:
+        # Replay any batch a crashed scraper left in the journal before rewriting the file
+        store = open_store(STATE_FILE, HIGH_RANGE, GOOD_IDS_FILE, BAD_IDS_FILE)
+        LedgerWriter(DATA_FILE, store).close()
+        store.close()
+
+        records = load_dataset(DATA_FILE)
+        http = CachingSession(requests.Session(), ResponseCache(CACHE_DIR), impersonate="chrome")
+        with PayloadArchive(ARCHIVE_DIR) as archive:
+            used, updated, unchanged = refresh(http, records, REQUEST_BUDGET, RateLimiter(), AimdController(rate=1), archive)
+
+    print(f"Job Done. {used} requests: {updated} updated, {unchanged} unchanged (304).")
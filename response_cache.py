@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+from collections import Counter
+
+MAX_CACHE_BYTES = 2 * 1024 ** 3   # Compressed bodies kept before the least recently fetched are dropped
+EXPIRE_AFTER = 30 * 86400         # Entries not fetched or revalidated for this long are dropped
+
+
+class ResponseCache:
+    """
+    Local content-addressed store of raw HTTP responses.
+
+    Layout under `cache_dir`:
+        urls/<sha256(url)>.json     -> status, ETag, Last-Modified, fetch time, body hash
+        objects/<sha256(body)>.z    -> zlib-compressed body (shared by identical payloads)
+
+    Bounded: entries older than `expire_after` seconds are dropped, then the
+    least recently fetched until the bodies fit in `max_bytes` (None turns
+    either limit off). Pruning runs on open and after every tenth of
+    `max_bytes` written.
+    """
+
+    def __init__(self, cache_dir, max_bytes=MAX_CACHE_BYTES, expire_after=EXPIRE_AFTER):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.expire_after = expire_after
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self._written = 0
+        self.prune()
+
+    def _url_path(self, url):
+        return os.path.join(self.cache_dir, "urls", hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest + ".z")
+
+    @staticmethod
+    def _write_atomic(path, payload):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def lookup(self, url):
+        """Cache entry for `url`, or None."""
+        path = self._url_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(self._object_path(entry["body"])):
+            return None
+        return entry
+
+    def body(self, entry):
+        with open(self._object_path(entry["body"]), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def store(self, url, status_code, headers, content):
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            compressed = zlib.compress(content, 6)
+            self._write_atomic(object_path, compressed)
+            self._written += len(compressed)
+
+        entry = {
+            "url": url,
+            "status": status_code,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "fetched_at": time.time(),
+            "body": digest,
+        }
+        self._write_atomic(self._url_path(url), json.dumps(entry).encode())
+        if self.max_bytes is not None and self._written >= self.max_bytes // 10:
+            self.prune()
+        return entry
+
+    def touch(self, entry):
+        """Records a successful revalidation (304) without rewriting the body."""
+        entry["fetched_at"] = time.time()
+        self._write_atomic(self._url_path(entry["url"]), json.dumps(entry).encode())
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass   # Another process sharing the cache got there first
+
+    def prune(self):
+        """Applies the age and size limits and deletes bodies no entry uses. Returns entries dropped."""
+        self._written = 0
+        urls_dir = os.path.join(self.cache_dir, "urls")
+        objects_dir = os.path.join(self.cache_dir, "objects")
+
+        entries = []
+        for name in os.listdir(urls_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(urls_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                entries.append((entry["fetched_at"], path, entry["body"]))
+            except (OSError, ValueError, KeyError, TypeError):
+                self._remove(path)
+        sizes = {}
+        for name in os.listdir(objects_dir):
+            if name.endswith(".z"):
+                try:
+                    sizes[name[:-2]] = os.path.getsize(os.path.join(objects_dir, name))
+                except OSError:
+                    pass
+
+        users = Counter(body for _, _, body in entries)
+        total = sum(size for body, size in sizes.items() if users[body])
+        now = time.time()
+        dropped = 0
+        for fetched_at, path, body in sorted(entries):
+            expired = self.expire_after is not None and now - fetched_at > self.expire_after
+            if not expired and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            self._remove(path)
+            dropped += 1
+            users[body] -= 1
+            if not users[body]:
+                total -= sizes.get(body, 0)
+
+        for body in sizes:
+            if not users[body]:
+                self._remove(self._object_path(body))
+        return dropped
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
+class CachedResponse:
+    """The subset of the requests / curl_cffi Response API the fetch scripts use."""
+
+    def __init__(self, entry, content, revalidated=False):
+        self.url = entry["url"]
+        self.status_code = entry["status"]
+        self.headers = {"Content-Type": entry.get("content_type") or "application/json"}
+        if entry.get("etag"):
+            self.headers["ETag"] = entry["etag"]
+        if entry.get("last_modified"):
+            self.headers["Last-Modified"] = entry["last_modified"]
+        self.content = content
+        self.from_cache = True
+        self.revalidated = revalidated
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class CachingSession:
+    """
+    Wraps anything with a `get(url, headers=..., **kwargs)` method - the
+    `requests` module, a requests.Session, or curl_cffi's requests module /
+    Session - and answers from the cache.
+
+    Entries younger than `max_age` seconds are served without touching the
+    network. Older ones are revalidated with If-None-Match / If-Modified-Since,
+    so an unchanged payload costs a bodiless 304 instead of a full download.
+    Only 200 responses are cached.
+    """
+
+    def __init__(self, session, cache, max_age=None, **default_kwargs):
+        self.session = session
+        self.cache = cache
+        self.max_age = max_age
+        self.default_kwargs = default_kwargs
+
+    def _prepare(self, url, headers):
+        entry = self.cache.lookup(url)
+        headers = dict(headers or {})
+        if entry is not None:
+            headers.update(self.cache.conditional_headers(entry))
+        return entry, headers
+
+    def _fresh(self, entry):
+        return entry is not None and self.max_age is not None and time.time() - entry["fetched_at"] < self.max_age
+
+    def _finish(self, url, entry, response):
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(entry)
+            return CachedResponse(entry, self.cache.body(entry), revalidated=True)
+        if response.status_code == 200:
+            self.cache.store(url, response.status_code, response.headers, response.content)
+        return response
+
+    def get(self, url, headers=None, **kwargs):
+        entry, headers = self._prepare(url, headers)
+        if self._fresh(entry):
+            return CachedResponse(entry, self.cache.body(entry))
+        response = self.session.get(url, headers=headers, **self.default_kwargs, **kwargs)
+        return self._finish(url, entry, response)
+
+
+class AsyncCachingSession(CachingSession):
+    """CachingSession for curl_cffi's AsyncSession (awaitable get)."""
+
+    async def get(self, url, headers=None, **kwargs):
+        entry, headers = self._prepare(url, headers)
+        if self._fresh(entry):
+            return CachedResponse(entry, self.cache.body(entry))
+        response = await self.session.get(url, headers=headers, **self.default_kwargs, **kwargs)
+        return self._finish(url, entry, response)
@@ -0,0 +1,201 @@
+import json
+import os
+import time
+
+# Request latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+OUTCOMES = ("success", "not_found", "rate_limited", "server_error", "error")
+
+# LOG_LEVEL values
+LOG_ALL = "all"           # One line per ID (the old behaviour)
+LOG_SAMPLED = "sampled"   # Every Nth ID + every warning + a periodic summary
+LOG_QUIET = "quiet"       # Warnings and summaries only
+
+
+def outcome_of(status_code):
+    if status_code == 200:
+        return "success"
+    if status_code == 404:
+        return "not_found"
+    if status_code == 429:
+        return "rate_limited"
+    if status_code >= 500:
+        return "server_error"
+    return "error"
+
+
+class ScraperMetrics:
+    """
+    Counters, a latency histogram and gauges for one scraper process.
+
+    Every `export_interval` seconds the current values are written to a
+    Prometheus textfile (for node_exporter's textfile collector) and a JSON
+    snapshot, and a one-line summary is printed.
+    """
+
+    def __init__(self, prom_file=None, json_file=None, export_interval=15.0,
+                 log_level=LOG_SAMPLED, log_every=100, labels=None):
+        self.prom_file = prom_file
+        self.json_file = json_file
+        self.export_interval = export_interval
+        self.log_level = log_level
+        self.log_every = log_every
+        self.labels = labels or {}
+
+        self.started = time.time()
+        self.counts = {outcome: 0 for outcome in OUTCOMES}
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.bytes_downloaded = 0
+        self.backoff_seconds = 0.0
+        self.request_rate = 0.0
+        self.remaining = None
+
+        self._events = 0
+        self._last_export = time.monotonic()
+
+    # --- RECORDING ---
+    def observe(self, status_code, latency, nbytes=0):
+        """Records one completed request."""
+        self.counts[outcome_of(status_code)] += 1
+        self._observe_latency(latency)
+        self.bytes_downloaded += nbytes
+
+    def observe_error(self, latency):
+        """Records a request that raised (timeout, connection reset...)."""
+        self.counts["error"] += 1
+        self._observe_latency(latency)
+
+    def _observe_latency(self, latency):
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def set_pacing(self, request_rate, backoff_seconds):
+        self.request_rate = request_rate
+        self.backoff_seconds = backoff_seconds
+
+    def set_remaining(self, remaining):
+        self.remaining = remaining
+
+    # --- DERIVED VALUES ---
+    @property
+    def requests(self):
+        return sum(self.counts.values())
+
+    def requests_per_second(self):
+        elapsed = time.time() - self.started
+        return self.requests / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        """Time to probe the remaining IDs at the average rate so far, or None."""
+        elapsed = time.time() - self.started
+        # 429/5xx answers don't resolve an ID (it is requeued), so they don't count as progress
+        resolved = self.requests - self.counts["rate_limited"] - self.counts["server_error"]
+        if self.remaining is None or elapsed <= 0 or resolved <= 0:
+            return None
+        return self.remaining / (resolved / elapsed)
+
+    # --- LOGGING ---
+    def log(self, message):
+        """Per-ID message: printed according to the log level."""
+        self._events += 1
+        if self.log_level == LOG_ALL or (self.log_level == LOG_SAMPLED and self._events % self.log_every == 0):
+            print(message)
+
+    def warn(self, message):
+        """Rate limits, errors: always printed."""
+        print(message)
+
+    def summary(self):
+        eta = self.eta_seconds()
+        eta_text = f"{eta / 3600:.1f}h" if eta is not None else "?"
+        scope = "".join(f" {key}={value}" for key, value in sorted(self.labels.items()))
+        return (f"[stats{scope}] {self.requests} req ({self.requests_per_second():.2f}/s) | "
+                f"ok {self.counts['success']} | 404 {self.counts['not_found']} | "
+                f"429 {self.counts['rate_limited']} | 5xx {self.counts['server_error']} | err {self.counts['error']} | "
+                f"{self.bytes_downloaded / 1e6:.1f} MB | rate {self.request_rate:.2f}/s | "
+                f"backoff {self.backoff_seconds:.1f}s | remaining {self.remaining} | ETA {eta_text}")
+
+    # --- EXPORT ---
+    def maybe_export(self):
+        if time.monotonic() - self._last_export >= self.export_interval:
+            self.export()
+
+    def export(self):
+        self._last_export = time.monotonic()
+        if self.log_level != LOG_ALL:
+            print(self.summary())
+        if self.prom_file:
+            self._write_atomic(self.prom_file, self.to_prometheus())
+        if self.json_file:
+            self._write_atomic(self.json_file, json.dumps(self.snapshot(), indent=2))
+
+    @staticmethod
+    def _write_atomic(path, text):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def snapshot(self):
+        return {
+            "labels": self.labels,
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.started,
+            "requests": self.requests,
+            "requests_per_second": self.requests_per_second(),
+            "outcomes": dict(self.counts),
+            "latency_seconds": {
+                "buckets": dict(zip(map(str, LATENCY_BUCKETS), self.bucket_counts)),
+                "sum": self.latency_sum,
+                "count": self.requests,
+            },
+            "bytes_downloaded": self.bytes_downloaded,
+            "request_rate": self.request_rate,
+            "backoff_seconds": self.backoff_seconds,
+            "remaining_ids": self.remaining,
+            "eta_seconds": self.eta_seconds(),
+        }
+
+    def _labels(self, extra=None):
+        labels = dict(self.labels, **(extra or {}))
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+    def to_prometheus(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP manga_scraper_{name} {help_text}")
+            lines.append(f"# TYPE manga_scraper_{name} {kind}")
+            for suffix, extra, value in samples:
+                lines.append(f"manga_scraper_{name}{suffix}{self._labels(extra)} {value}")
+
+        metric("requests_total", "counter", "Requests by outcome.",
+               [("", {"outcome": outcome}, count) for outcome, count in self.counts.items()])
+
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts):
+            cumulative += count
+            buckets.append(("_bucket", {"le": str(bound)}, cumulative))
+        buckets.append(("_bucket", {"le": "+Inf"}, self.requests))
+        buckets.append(("_sum", None, self.latency_sum))
+        buckets.append(("_count", None, self.requests))
+        metric("request_latency_seconds", "histogram", "Request latency.", buckets)
+
+        metric("downloaded_bytes_total", "counter", "Response bytes downloaded.", [("", None, self.bytes_downloaded)])
+        metric("requests_per_second", "gauge", "Average request throughput.", [("", None, self.requests_per_second())])
+        metric("request_rate", "gauge", "Current paced request rate (req/s).", [("", None, self.request_rate)])
+        metric("backoff_seconds", "gauge", "Current backoff before the next request.", [("", None, self.backoff_seconds)])
+        if self.remaining is not None:
+            metric("remaining_ids", "gauge", "IDs left to probe.", [("", None, self.remaining)])
+        eta = self.eta_seconds()
+        if eta is not None:
+            metric("eta_seconds", "gauge", "Estimated time to completion.", [("", None, eta)])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+# Segments in priority order: a row gets the first one whose every bound it
+# meets. A bound is (lower, upper) over named cutoffs: value >= lower and
+# value < upper, None meaning unbounded. Rows matching none are DEFAULT_SEGMENT.
+SEGMENTS = [
+    ("Masterpiece",        {"score": ("high", None), "members": ("high", None)}),
+    ("Cult Classic",       {"score": ("high", None), "members": (None, "low")}),
+    ("Viral Hit",          {"score": (None, "low"),  "members": ("high", None)}),
+    ("Quality Hidden Gem", {"score": ("high", None), "members": ("low", "high")}),
+]
+DEFAULT_SEGMENT = "Average"
+
+# Cutoffs as quantiles of each metric (the original quartile rules)
+DEFAULT_QUANTILES = {
+    "score": {"low": 0.25, "high": 0.75},
+    "members": {"low": 0.25, "high": 0.75},
+}
+
+
+def resolve_cutoffs(df, quantiles=None, absolute=None):
+    """
+    The numeric cutoff behind every named bound: quantiles of the column
+    (DEFAULT_QUANTILES, updated by `quantiles`), except where `absolute`
+    gives a fixed value, e.g. absolute={"score": {"high": 8.0}}.
+
+    Returns:
+        dict: metric -> {cutoff name -> value}
+    """
+    spec = {metric: dict(bounds) for metric, bounds in DEFAULT_QUANTILES.items()}
+    for metric, bounds in (quantiles or {}).items():
+        spec.setdefault(metric, {}).update(bounds)
+    absolute = absolute or {}
+
+    cutoffs = {}
+    for metric, bounds in spec.items():
+        fixed = absolute.get(metric, {})
+        wanted = {name: q for name, q in bounds.items() if name not in fixed}
+        cutoffs[metric] = {}
+        if wanted:
+            values = np.nanquantile(df[metric].to_numpy(dtype=np.float64), list(wanted.values()))
+            cutoffs[metric].update(zip(wanted, values))
+        cutoffs[metric].update(fixed)
+    return cutoffs
+
+
+def segment(df, quantiles=None, absolute=None, segments=SEGMENTS, default=DEFAULT_SEGMENT):
+    """
+    Labels every row of `df` with a segment using whole-column comparisons
+    (no per-row Python), and summarises each segment in the same pass.
+    A missing value fails every bound, so such rows fall to `default`.
+
+    Returns:
+        tuple: (labels, summary, cutoffs)
+            labels:  categorical Series aligned with df
+            summary: count, share and <metric>_mean / _std per segment (in segment order)
+            cutoffs: the resolved thresholds (see resolve_cutoffs)
+    """
+    cutoffs = resolve_cutoffs(df, quantiles, absolute)
+    values = {metric: df[metric].to_numpy(dtype=np.float64) for metric in cutoffs}
+
+    codes = np.full(len(df), len(segments), dtype=np.int8)
+    unassigned = np.ones(len(df), dtype=bool)
+    for code, (_, rule) in enumerate(segments):
+        match = unassigned.copy()
+        for metric, (lower, upper) in rule.items():
+            if lower is not None:
+                match &= values[metric] >= cutoffs[metric][lower]
+            if upper is not None:
+                match &= values[metric] < cutoffs[metric][upper]
+        codes[match] = code
+        unassigned &= ~match
+
+    names = [name for name, _ in segments] + [default]
+    labels = pd.Series(pd.Categorical.from_codes(codes, names), index=df.index, name="category")
+
+    count = np.bincount(codes, minlength=len(names))
+    summary = {"count": count, "share": count / len(df) if len(df) else count.astype(np.float64)}
+    for metric, column in values.items():
+        present = np.isfinite(column)
+        filled = np.where(present, column, 0.0)
+        n = np.bincount(codes, weights=present, minlength=len(names))
+        total = np.bincount(codes, weights=filled, minlength=len(names))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = total / n
+            deviation = np.where(present, column - mean[codes], 0.0)
+            var = np.bincount(codes, weights=deviation * deviation, minlength=len(names)) / (n - 1)
+        summary[f"{metric}_mean"] = np.where(n > 0, mean, np.nan)
+        summary[f"{metric}_std"] = np.where(n > 1, np.sqrt(var), np.nan)
+    return labels, pd.DataFrame(summary, index=names), cutoffs
@@ -0,0 +1,207 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+from rate_limiter import SharedRateLimiter, PER_SECOND_LIMIT
+from id_store import IdStore, open_store, UNKNOWN, GOOD, BAD
+from batch_writer import LedgerWriter
+from file_lock import FileLock
+from payload_archive import PayloadArchive
+from scraper_metrics import LOG_QUIET
+from manga_scraper import Scraper, load_config
+
+script_dir=os.path.dirname(os.path.abspath(__file__))
+
+# --- FILES ---
+DATA_FILE = os.path.join(script_dir,"manga_data_full_1.jsonl")      # Merged dataset
+BAD_IDS_FILE = os.path.join(script_dir,"bad_ids_1.txt")
+GOOD_IDS_FILE = os.path.join(script_dir,"good_ids_1.txt")
+STATE_FILE = os.path.join(script_dir,"id_state_1.bin")              # Merged ledger
+ARCHIVE_DIR = os.path.join(script_dir,"raw_archive_1")              # Merged payload archive
+SHARD_DIR = os.path.join(script_dir,"shards")                       # One sub-folder per shard
+LOW_RANGE=1
+HIGH_RANGE=600000
+SHARD_COUNT = 4
+TARGET_PER_SHARD = 125000
+MAX_CONSICUTIVE_FALIURE=2500
+
+
+def plan_shards(low, high, count):
+    """Splits low..high into `count` contiguous, disjoint ranges, each with its own files."""
+    size = (high - low + 1 + count - 1) // count
+    shards = []
+    for index in range(count):
+        shard_low = low + index * size
+        shard_high = min(high, shard_low + size - 1)
+        if shard_low > shard_high:
+            break
+        folder = os.path.join(SHARD_DIR, f"shard_{shard_low}_{shard_high}")
+        shards.append({
+            "index": index,
+            "low": shard_low,
+            "high": shard_high,
+            "folder": folder,
+            "data_file": os.path.join(folder, "manga_data.jsonl"),
+            "state_file": os.path.join(folder, "id_state.bin"),
+            "cursor_file": os.path.join(folder, "sweep_cursor.json"),
+            "archive_dir": os.path.join(folder, "raw_archive"),
+        })
+    return shards
+
+
+def discover_shards():
+    """Every shard folder on disk (whatever split created it), ordered by range."""
+    shards = []
+    if os.path.isdir(SHARD_DIR):
+        for name in os.listdir(SHARD_DIR):
+            manifest = os.path.join(SHARD_DIR, name, "shard.json")
+            if os.path.exists(manifest):
+                with open(manifest, "r") as f:
+                    shards.append(json.load(f))
+    shards.sort(key=lambda shard: shard["low"])
+    for index, shard in enumerate(shards):
+        shard["index"] = index
+    return shards
+
+
+def seed_shard(shard, global_store):
+    """First run only: copies the shard's slice of the global ledger so nothing is re-probed."""
+    if os.path.exists(shard["state_file"]):
+        return
+    os.makedirs(shard["folder"], exist_ok=True)
+    with open(os.path.join(shard["folder"], "shard.json"), "w") as f:
+        json.dump(shard, f)
+    with IdStore(shard["state_file"], shard["high"]) as shard_store:
+        for manga_id in range(shard["low"], shard["high"] + 1):
+            state = global_store.get(manga_id)
+            if state != UNKNOWN:
+                shard_store.set(manga_id, state)
+
+
+def shard_archive_dir(shard):
+    # Manifests written before shards had their own archive lack the key
+    return shard.get("archive_dir") or os.path.join(shard["folder"], "raw_archive")
+
+
+def run_shard(shard, limiter, target, start_rate):
+    """Worker process: the usual probe loop, confined to one shard's range and files."""
+    config = load_config("linux", overrides={
+        "low": shard["low"],
+        "high": shard["high"],
+        "data_file": shard["data_file"],
+        "state_file": shard["state_file"],
+        "cursor_file": shard["cursor_file"],
+        "good_ids_file": None,           # Seeded from the global ledger instead
+        "bad_ids_file": None,
+        # An archive has a single writer; merge() folds them into ARCHIVE_DIR
+        "archive_dir": shard_archive_dir(shard),
+        # Per-shard textfiles; the shard label keeps their series apart once collected
+        "metrics_prom_file": os.path.join(shard["folder"], "scraper.prom"),
+        "metrics_json_file": os.path.join(shard["folder"], "scraper.json"),
+        "target": target,
+        "max_consecutive_failures": MAX_CONSICUTIVE_FALIURE,
+        "async": False,
+        # Each shard starts at its share of the global rate; the shared limiter is the hard ceiling
+        "start_rate": start_rate,
+        "log_level": LOG_QUIET,
+    })
+    Scraper(config, limiter=limiter, labels={"shard": str(shard["index"])}).run()
+
+
+def run(shards, target):
+    # Held for the whole run, so a frontier watcher can't work the global ledger meanwhile
+    with FileLock(STATE_FILE + ".lock"):
+        _run(shards, target)
+
+
+def _run(shards, target):
+    with open_store(STATE_FILE, HIGH_RANGE, GOOD_IDS_FILE, BAD_IDS_FILE) as global_store:
+        for shard in shards:
+            seed_shard(shard, global_store)
+
+    limiter = SharedRateLimiter()
+    start_rate = PER_SECOND_LIMIT / len(shards) / 2
+    workers = [multiprocessing.Process(target=run_shard, args=(shard, limiter, target, start_rate)) for shard in shards]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def _read_records(filename):
+    if not os.path.exists(filename):
+        return
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def merge(shards):
+    """
+    Folds every shard into the global dataset and ledger.
+
+    Deterministic: records are keyed by ID, the freshest `fetched_at` wins
+    (ties go to the later source: global file first, then shards by index),
+    and the output is written sorted by ID. Ledger states are copied from
+    each shard's range; UNKNOWN never overwrites a known state. Shard
+    payloads are added to the global archive where they are fresher.
+    """
+    with FileLock(STATE_FILE + ".lock"), open_store(STATE_FILE, HIGH_RANGE, GOOD_IDS_FILE, BAD_IDS_FILE) as global_store:
+        # Settle any batch a crashed writer left behind before reading the files
+        LedgerWriter(DATA_FILE, global_store).close()
+
+        records = {}
+        sources = [DATA_FILE]
+        for shard in shards:
+            if not os.path.exists(shard["state_file"]):
+                continue
+            with IdStore(shard["state_file"], shard["high"]) as shard_store:
+                LedgerWriter(shard["data_file"], shard_store).close()
+                for manga_id in range(shard["low"], shard["high"] + 1):
+                    state = shard_store.get(manga_id)
+                    if state != UNKNOWN:
+                        global_store.set(manga_id, state)
+            sources.append(shard["data_file"])
+
+        for source in sources:
+            for record in _read_records(source):
+                old = records.get(record.get("id"))
+                if old is None or (record.get("fetched_at") or 0) >= (old.get("fetched_at") or 0):
+                    records[record.get("id")] = record
+
+        tmp_file = DATA_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for manga_id in sorted(k for k in records if k is not None):
+                f.write(json.dumps(records[manga_id], ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, DATA_FILE)
+        global_store.flush()
+
+        archived = 0
+        with PayloadArchive(ARCHIVE_DIR) as archive:
+            for shard in shards:
+                if os.path.exists(os.path.join(shard_archive_dir(shard), "index.tsv")):
+                    archived += archive.merge_from(PayloadArchive(shard_archive_dir(shard), read_only=True))
+
+        print(f"Merged {len(sources) - 1} shard(s): {len(records)} manga | Good: {global_store.count(GOOD)} | Blacklisted: {global_store.count(BAD)} | Payloads archived: {archived}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-process scraping over disjoint ID ranges.")
+    parser.add_argument("command", choices=["run", "merge"], help="run the shard workers, or merge their output")
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT)
+    parser.add_argument("--target", type=int, default=TARGET_PER_SHARD, help="captures per shard before it stops")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(plan_shards(LOW_RANGE, HIGH_RANGE, args.shards), args.target)
+        print("All shards finished. Run 'python shard_scraper.py merge' to combine them.")
+    else:
+        merge(discover_shards())
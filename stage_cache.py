@@ -0,0 +1,310 @@
+"""
+Content-addressed cache for multi-stage analysis pipelines.
+
+Stages form a small DAG. A stage's key is a hash of its name, its source
+code, its parameters and the keys of the stages it depends on; a source
+stage's key is the hash of its file's contents. So a key changes exactly
+when something upstream of the stage does, and a rerun recomputes only
+those stages. Everything else is loaded from the cache, and what it printed
+the first time is replayed.
+
+Besides a stage's own source, its key covers the file the stage is
+defined in and every local module (next to that file) it imports,
+directly or through each other, so editing any helper a stage may call
+reruns it.
+"""
+import contextlib
+import hashlib
+import inspect
+import io
+import json
+import os
+import pickle
+import sys
+
+CACHE_DIR = ".stage_cache"
+MAX_CACHE_BYTES = 1024 ** 3   # Least recently used entries are evicted past this
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """sha256 of a file's contents ("missing" if it doesn't exist)."""
+    if not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_digest(func):
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = getattr(func, "__qualname__", repr(func))
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def _module_file(value):
+    """The source file of a module, or of the module a function/class was defined in."""
+    module = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+    path = getattr(module, "__file__", None)
+    return os.path.abspath(path) if path and path.endswith(".py") else None
+
+
+def imported_modules(func):
+    """
+    Source files of `func`'s own module and of the local modules (in the
+    same directory) it imports, following their imports in turn.
+    """
+    own = _module_file(func)
+    if own is None:
+        return []
+    root = os.path.dirname(own)
+    seen, stack = {own}, [sys.modules.get(func.__module__)]
+    while stack:
+        module = stack.pop()
+        for value in list(vars(module).values()):
+            path = _module_file(value)
+            if path is None or path in seen or os.path.dirname(path) != root:
+                continue
+            seen.add(path)
+            imported = value if inspect.ismodule(value) else sys.modules.get(value.__module__)
+            if imported is not None:
+                stack.append(imported)
+    return sorted(seen)
+
+
+class StageCache:
+    """
+    Pickled stage results (plus their console output) under `cache_dir`,
+    one file pair per key. Reading an entry marks it as recently used; once
+    the entries exceed `max_bytes`, the least recently used are deleted.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key, ".pkl")) and os.path.exists(self._path(key, ".log"))
+
+    def _touch(self, key):
+        for ext in (".pkl", ".log"):
+            try:
+                os.utime(self._path(key, ext))
+            except OSError:
+                pass
+
+    def load(self, key):
+        """The cached value; raises KeyError if it is missing or unreadable."""
+        try:
+            with open(self._path(key, ".pkl"), "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            self.discard(key)
+            raise KeyError(key) from e
+        self._touch(key)
+        return value
+
+    def log(self, key):
+        with open(self._path(key, ".log"), "r", encoding="utf-8") as f:
+            self._touch(key)
+            return f.read()
+
+    def store(self, key, value, log=""):
+        """Caches `value`; a result that can't be pickled or written is just not cached."""
+        tmp_file = self._path(key, ".pkl.tmp")
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, self._path(key, ".pkl"))
+            with open(self._path(key, ".log"), "w", encoding="utf-8") as f:
+                f.write(log)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            self.discard(key)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_file)
+            print(f"⚠️  Stage result not cached: {e}")
+            return
+        self.evict(keep=key)
+
+    def discard(self, key):
+        for ext in (".pkl", ".log"):
+            try:
+                os.remove(self._path(key, ext))
+            except OSError:
+                pass
+
+    def entries(self):
+        """[(last_used, size, key)] for every entry, least recently used first."""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(name)
+            if ext not in (".pkl", ".log"):
+                continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            used, size = entries.get(key, (0, 0))
+            entries[key] = (max(used, st.st_mtime), size + st.st_size)
+        return sorted((used, size, key) for key, (used, size) in entries.items())
+
+    def evict(self, keep=None):
+        """Deletes least recently used entries until the cache fits in max_bytes. Returns bytes freed."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, key in entries:
+            if total - freed <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.discard(key)
+            freed += size
+        return freed
+
+    def clear(self):
+        for _, _, key in self.entries():
+            self.discard(key)
+
+
+class _Tee(io.TextIOBase):
+    """Writes through to `stream` and keeps a copy."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = io.StringIO()
+
+    def write(self, text):
+        self.stream.write(text)
+        self.copy.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Pipeline:
+    """
+    A DAG of cached stages. Stages are declared in dependency order (a stage
+    can only depend on ones declared before it), which also makes that the
+    order they run in.
+
+        pipeline = Pipeline(StageCache())
+        pipeline.source("dataset", "data.csv")
+        pipeline.stage("load", load, deps=["dataset"])
+        pipeline.stage("chart", plot, deps=["load"], params={"bins": 30}, outputs=["chart.png"])
+        pipeline.run()
+
+    A stage with `outputs` (files it writes) is also recomputed when one of
+    them has gone missing. With `cache=None` every stage just runs.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.stages = {}
+        self.keys = {}
+        self.values = {}
+        self.status = {}   # name -> "cached" / "computed"
+        self._file_digests = {}
+
+    def source(self, name, path):
+        """A leaf: its value is `path`, its key the hash of the file's contents."""
+        self.stages[name] = {"source": path, "deps": []}
+
+    def stage(self, name, func, deps=(), params=None, outputs=()):
+        """`func` is called with the dependencies' values (in `deps` order), then `params` as keywords."""
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name!r} depends on {dep!r}, which isn't declared before it")
+        self.stages[name] = {"func": func, "deps": list(deps), "params": dict(params or {}), "outputs": list(outputs)}
+
+    def key(self, name):
+        if name not in self.keys:
+            stage = self.stages[name]
+            if "source" in stage:
+                self.keys[name] = file_digest(stage["source"])
+            else:
+                spec = {
+                    "name": name,
+                    "code": code_digest(stage["func"]),
+                    "modules": {os.path.basename(path): self._file_digest(path)
+                                for path in imported_modules(stage["func"])},
+                    "params": stage["params"],
+                    "deps": [self.key(dep) for dep in stage["deps"]],
+                }
+                self.keys[name] = hashlib.sha256(json.dumps(spec, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+        return self.keys[name]
+
+    def _file_digest(self, path):
+        if path not in self._file_digests:
+            self._file_digests[path] = file_digest(path)
+        return self._file_digests[path]
+
+    def _cached(self, name):
+        stage = self.stages[name]
+        return (self.cache is not None and self.key(name) in self.cache
+                and all(os.path.exists(path) for path in stage["outputs"]))
+
+    def _needed(self, targets):
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name]["deps"])
+        return [name for name in self.stages if name in needed]
+
+    def value(self, name):
+        """The stage's value: already at hand, loaded from the cache, or computed (dependencies first)."""
+        if name in self.values:
+            return self.values[name]
+        stage = self.stages[name]
+        if "source" in stage:
+            self.values[name] = stage["source"]
+            return self.values[name]
+
+        if self._cached(name):
+            try:
+                self.values[name] = self.cache.load(self.key(name))
+                return self.values[name]
+            except KeyError:
+                pass
+
+        args = [self.value(dep) for dep in stage["deps"]]
+        tee = _Tee(sys.stdout)
+        with contextlib.redirect_stdout(tee):
+            result = stage["func"](*args, **stage["params"])
+        self.values[name] = result
+        self.status[name] = "computed"
+        if self.cache is not None:
+            self.cache.store(self.key(name), result, tee.copy.getvalue())
+        return result
+
+    def run(self, *targets):
+        """
+        Brings `targets` (default: every stage) up to date in declaration
+        order. Cached stages replay their console output; their values are
+        only loaded if a stage that has to run needs them (or via value()).
+        """
+        targets = list(targets) or list(self.stages)
+        for name in self._needed(targets):
+            if name in self.status or "source" in self.stages[name]:
+                continue
+            if self._cached(name):
+                try:
+                    print(self.cache.log(self.key(name)), end="")
+                    self.status[name] = "cached"
+                    continue
+                except OSError:
+                    pass
+            self.value(name)
+
+    def summary(self):
+        cached = [name for name, status in self.status.items() if status == "cached"]
+        computed = [name for name, status in self.status.items() if status == "computed"]
+        return cached, computed
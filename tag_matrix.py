@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def parse_tags(value):
+    """One row's tags as a list: a list/array (Parquet, JSONL) or a ", "-joined string (CSV)."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [tag.strip() for tag in value.split(",") if tag.strip()]
+    if isinstance(value, float):
+        return []   # NaN: no tags
+    return [str(tag).strip() for tag in value if tag is not None and str(tag).strip()]
+
+
+class TagMatrix:
+    """
+    The canonical tag representation: tags are parsed once into an integer
+    vocabulary (column -> tag name, sorted) and a CSR matrix with one row per
+    manga and a 1 in each column whose tag the manga carries.
+
+    Row i belongs to manga ids[i]; matching is always on exact tag names.
+    """
+
+    def __init__(self, vocabulary, matrix, ids):
+        self.vocabulary = list(vocabulary)
+        self.index = {tag: i for i, tag in enumerate(self.vocabulary)}
+        self.matrix = sparse.csr_matrix(matrix)
+        self.ids = np.asarray(ids)
+
+    @classmethod
+    def from_tags(cls, tags, ids):
+        rows = [parse_tags(value) for value in tags]
+        vocabulary = sorted({tag for row in rows for tag in row})
+        index = {tag: i for i, tag in enumerate(vocabulary)}
+
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indices = []
+        for i, row in enumerate(rows):
+            indices.extend(sorted({index[tag] for tag in row}))
+            indptr[i + 1] = len(indices)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.uint8), np.asarray(indices, dtype=np.int32), indptr),
+            shape=(len(rows), len(vocabulary)),
+        )
+        return cls(vocabulary, matrix, ids)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def n_tags(self):
+        return len(self.vocabulary)
+
+    # --- QUERIES ---
+    def column(self, tag):
+        """Boolean row mask of the manga carrying exactly `tag`."""
+        if tag not in self.index:
+            return np.zeros(len(self), dtype=bool)
+        return self.matrix[:, self.index[tag]].toarray().ravel().astype(bool)
+
+    def counts(self):
+        """Manga per tag, indexed by tag name."""
+        return pd.Series(np.asarray(self.matrix.sum(axis=0)).ravel(), index=self.vocabulary)
+
+    def aggregate(self, columns):
+        """
+        Count plus mean and std (ddof=1, as pandas) of each value column for
+        every tag, in one grouped pass: a single product X^T [valid, v, v^2]
+        over all columns at once. Missing values are left out per column;
+        values are shifted by their overall mean first to keep the sums small.
+
+        Args:
+            columns (dict): name -> values row-aligned with the matrix
+
+        Returns:
+            pd.DataFrame: count, <name>_mean, <name>_std per tag, indexed by tag name
+        """
+        stacked, shifts = [], []
+        for values in columns.values():
+            values = np.asarray(values, dtype=np.float64)
+            valid = np.isfinite(values)
+            shift = values[valid].mean() if valid.any() else 0.0
+            centred = np.where(valid, values - shift, 0.0)
+            stacked.extend([valid.astype(np.float64), centred, centred * centred])
+            shifts.append(shift)
+
+        result = {"count": self.counts().to_numpy()}
+        if stacked:
+            sums = self.matrix.T.astype(np.float64) @ np.column_stack(stacked)
+            for k, name in enumerate(columns):
+                n, total, squares = sums[:, 3 * k], sums[:, 3 * k + 1], sums[:, 3 * k + 2]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    mean = total / n
+                    var = (squares - total * mean) / (n - 1)
+                result[f"{name}_mean"] = np.where(n > 0, mean + shifts[k], np.nan)
+                result[f"{name}_std"] = np.where(n > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+        return pd.DataFrame(result, index=self.vocabulary)
+
+    def take(self, positions, prune=True):
+        """The rows at `positions`; with `prune`, tags no row carries any more are dropped."""
+        matrix = self.matrix[positions]
+        vocabulary = self.vocabulary
+        if prune:
+            used = np.flatnonzero(np.asarray(matrix.sum(axis=0)).ravel())
+            if len(used) < len(vocabulary):
+                matrix = matrix[:, used]
+                vocabulary = [vocabulary[i] for i in used]
+        return TagMatrix(vocabulary, matrix, self.ids[positions])
+
+    # --- PERSISTENCE ---
+    def save(self, path, source=None):
+        """One .npz file; `source` describes the dataset it was built from."""
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            indptr=self.matrix.indptr,
+            indices=self.matrix.indices,
+            shape=np.asarray(self.matrix.shape),
+            ids=self.ids,
+            vocabulary=np.asarray(json.dumps(self.vocabulary)),
+            source=np.asarray(json.dumps(source)),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Returns (TagMatrix, source)."""
+        with np.load(path) as f:
+            indices = f["indices"]
+            matrix = sparse.csr_matrix((np.ones(len(indices), dtype=np.uint8), indices, f["indptr"]),
+                                       shape=tuple(f["shape"]))
+            tags = cls(json.loads(str(f["vocabulary"])), matrix, f["ids"])
+            return tags, json.loads(str(f["source"]))
+
+
+def tag_matrix_path(dataset_file):
+    """Where the tag matrix of a dataset is kept: next to it."""
+    return dataset_file + ".tags.npz"
+
+
+def _source_signature(dataset_file):
+    st = os.stat(dataset_file)
+    return {"file": os.path.basename(dataset_file), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_tag_matrix(dataset_file, df):
+    """
+    The tag matrix for `df` (loaded from `dataset_file`), row-aligned with it.
+    Reuses the persisted copy when the dataset is unchanged, otherwise parses
+    df['tags'] once and persists the result.
+    """
+    path = tag_matrix_path(dataset_file)
+    signature = _source_signature(dataset_file)
+    ids = df["id"].to_numpy()
+    if os.path.exists(path):
+        try:
+            tags, source = TagMatrix.load(path)
+            if source == signature and len(tags) == len(df) and np.array_equal(tags.ids, ids):
+                return tags
+        except (OSError, ValueError, KeyError):
+            pass
+
+    tags = TagMatrix.from_tags(df["tags"], ids)
+    try:
+        tags.save(path, signature)
+    except OSError as e:
+        print(f"⚠️  Could not persist tag matrix to {path}: {e}")
+    return tags
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build (or refresh) the tag matrix persisted next to a dataset.")
+    parser.add_argument("dataset", nargs="?", default="final_manga_dataset_clean.csv")
+    args = parser.parse_args()
+
+    tags = load_tag_matrix(args.dataset, pd.read_csv(args.dataset))
+    counts = tags.counts()
+    print(f"{len(tags)} manga x {tags.n_tags} tags, {tags.matrix.nnz} assignments -> {tag_matrix_path(args.dataset)}")
+    print(f"Most common: {', '.join(counts.nlargest(10).index)}")
@@ -0,0 +1,119 @@
+from id_scheduler import SweepScheduler
+from id_store import UNKNOWN, GOOD, BAD, ERROR
+
+LOW, HIGH = 1, 200
+
+
+def make_scheduler(states, state_file):
+    return SweepScheduler(LOW, HIGH, lambda manga_id: states[manga_id] in (GOOD, BAD),
+                          state_file=state_file, seed=7, save_every=10, lookback=4)
+
+
+def probe_until_killed(scheduler, states, graceful):
+    """
+    Workers hold four IDs at a time; a burst of 429s has every one of them
+    requeued, every 7th ID fails (ERROR). The process is stopped while the
+    requeued IDs are being retried: `graceful` runs the scraper's close()
+    (which saves), otherwise it dies without saving.
+    """
+    walk = iter(scheduler)
+    handled = 0
+    while True:
+        in_flight = [next(walk) for _ in range(4)]
+        handled += 1
+        if handled == 10:
+            for manga_id in in_flight:
+                scheduler.requeue(manga_id)
+            next(walk)              # the first retry is in flight when the process stops
+            if graceful:
+                scheduler.save()
+            return
+        for manga_id in in_flight:
+            states[manga_id] = ERROR if manga_id % 7 == 0 else GOOD if manga_id % 2 else BAD
+
+
+def resume(states, state_file):
+    scheduler = make_scheduler(states, state_file)
+    probed = []
+    for manga_id in scheduler:      # the server behaves now
+        probed.append(manga_id)
+        states[manga_id] = GOOD
+    return scheduler, probed
+
+
+def test_stopped_mid_retry_resolves_every_id(tmp_path):
+    state_file = str(tmp_path / "cursor.json")
+    states = dict.fromkeys(range(LOW, HIGH + 1), UNKNOWN)
+
+    probe_until_killed(make_scheduler(states, state_file), states, graceful=True)
+    blacklisted = {manga_id for manga_id, state in states.items() if state == BAD}
+    assert len(make_scheduler(states, state_file).retry) == 3
+
+    scheduler, probed = resume(states, state_file)
+    assert all(state in (GOOD, BAD) for state in states.values())
+    assert scheduler.remaining == 0
+    assert not set(probed) & blacklisted
+
+
+def test_killed_mid_retry_resolves_every_id(tmp_path):
+    state_file = str(tmp_path / "cursor.json")
+    states = dict.fromkeys(range(LOW, HIGH + 1), UNKNOWN)
+
+    probe_until_killed(make_scheduler(states, state_file), states, graceful=False)
+    assert any(state == ERROR for state in states.values())
+
+    # The retries and the IDs in flight were never saved; the retry pass finds them
+    resume(states, state_file)
+    assert all(state in (GOOD, BAD) for state in states.values())
+
+
+def test_retry_queue_survives_restart(tmp_path):
+    state_file = str(tmp_path / "cursor.json")
+    states = dict.fromkeys(range(LOW, HIGH + 1), UNKNOWN)
+
+    scheduler = make_scheduler(states, state_file)
+    walk = iter(scheduler)
+    first = next(walk)
+    scheduler.requeue(first)
+    scheduler.save()
+
+    resumed = make_scheduler(states, state_file)
+    assert list(resumed.retry) == [first]
+    assert next(iter(resumed)) == first
+
+
+def test_finished_walk_revisits_errors_on_next_run(tmp_path):
+    state_file = str(tmp_path / "cursor.json")
+    states = dict.fromkeys(range(LOW, HIGH + 1), BAD)
+    states[42] = ERROR
+
+    scheduler = make_scheduler(states, state_file)
+    scheduler.retry_passes = 0
+    assert list(scheduler) == [42]
+    assert scheduler.progress() == 1.0
+
+    assert list(make_scheduler(states, state_file)) == [42]
+
+
+def test_late_requeue_is_not_dropped(tmp_path):
+    state_file = str(tmp_path / "cursor.json")
+    states = dict.fromkeys(range(LOW, HIGH + 1), UNKNOWN)
+
+    scheduler = make_scheduler(states, state_file)
+    walk = iter(scheduler)
+    scheduler.in_flight = 1         # one request outlives the walk
+    handed_out = []
+    for manga_id in walk:
+        if manga_id is None:        # walk done, but the request may still requeue
+            break
+        handed_out.append(manga_id)
+        states[manga_id] = GOOD
+
+    assert sorted(handed_out) == list(range(LOW, HIGH + 1))
+    states[handed_out[-1]] = UNKNOWN
+    scheduler.requeue(handed_out[-1])   # ...and comes back with a 429
+    scheduler.in_flight = 0
+    assert next(walk) == handed_out[-1]
+    states[handed_out[-1]] = GOOD
+    assert list(walk) == []
+
@@ -0,0 +1,39 @@
+from jsonl_loader import JsonlColumns, iter_jsonl_ranges, load_jsonl, split_ranges
+
+
+def write(tmp_path, text):
+    path = tmp_path / "data.jsonl"
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+def test_full_load_keeps_unterminated_last_line(tmp_path):
+    filename = write(tmp_path, '{"id": 1, "title": "A"}\n{"id": 2, "title": "B"}')
+    result = load_jsonl(filename, workers=1)
+    assert result.column("id") == [1, 2]
+    assert result.malformed == 0
+
+
+def test_full_load_counts_torn_last_line_as_malformed(tmp_path):
+    filename = write(tmp_path, '{"id": 1, "title": "A"}\n{"id": 2, "ti')
+    result = load_jsonl(filename, workers=1)
+    assert result.column("id") == [1]
+    assert result.malformed == 1
+
+
+def test_complete_lines_leaves_torn_tail_for_next_run(tmp_path):
+    text = '{"id": 1}\n{"id": 2}\n{"id": 3'
+    filename = write(tmp_path, text)
+    ranges = split_ranges(filename, range_bytes=4, complete_lines=True)
+    assert ranges[-1][1] == text.index('{"id": 3')
+    assert split_ranges(filename, range_bytes=4)[-1][1] == len(text)
+
+
+def test_small_ranges_cover_every_line(tmp_path):
+    filename = write(tmp_path, "".join(f'{{"id": {i}}}\n' for i in range(50)) + '{"id": 50}')
+    result = JsonlColumns()
+    parts = list(iter_jsonl_ranges(filename, fields=["id"], workers=1, range_bytes=16))
+    for part in parts:
+        result.extend(part)
+    assert len(parts) > 1
+    assert result.column("id") == list(range(51))
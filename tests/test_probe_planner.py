@@ -0,0 +1,27 @@
+from id_store import IdStore, UNKNOWN, GOOD, BAD
+
+from probe_planner import DensityScheduler
+
+
+def test_late_requeue_is_not_dropped(tmp_path):
+    with IdStore(str(tmp_path / "ids.bin"), 100) as store:
+        for manga_id in range(1, 51):
+            store.set(manga_id, GOOD if manga_id % 3 else BAD)
+        scheduler = DensityScheduler(store, 1, 100, block_size=20)
+
+        walk = iter(scheduler)
+        scheduler.in_flight = 1         # one request outlives the walk
+        handed_out = []
+        for manga_id in walk:
+            if manga_id is None:        # blocks walked, but the request may still requeue
+                break
+            handed_out.append(manga_id)
+            store.set(manga_id, GOOD)
+
+        assert sorted(handed_out) == list(range(51, 101))
+        store.set(handed_out[-1], UNKNOWN)
+        scheduler.requeue(handed_out[-1])   # ...and comes back with a 429
+        scheduler.in_flight = 0
+        assert next(walk) == handed_out[-1]
+        store.set(handed_out[-1], GOOD)
+        assert list(walk) == []